@@ -1,6 +1,8 @@
 import discord
+import json
 from discord.ext import commands
 from discord import app_commands
+from bot.payments.crypto import CryptoHandler
 from bot.utils.embeds import EmbedBuilder
 from bot.utils.permissions import is_admin, is_owner
 from bot.utils.logger import setup_logger
@@ -19,59 +21,49 @@ class AdminCommands(commands.Cog):
         await interaction.response.defer(ephemeral=True)
         
         try:
-            # Get analytics
-            analytics = await self.bot.db.get_sales_analytics(days=7)
+            # Served from the background snapshot
+            stats = await self.bot.dashboard.get()
             
             embed = discord.Embed(
                 title="🛠️ Admin Dashboard",
+                description=f"As of <t:{int(self.bot.dashboard.as_of)}:R>",
                 color=Config.EMBED_COLOR
             )
             
             embed.add_field(
                 name="📊 Last 7 Days",
                 value=(
-                    f"**Orders:** {analytics['total_orders']}\n"
-                    f"**Revenue:** ${analytics['total_revenue']:.2f}"
+                    f"**Orders:** {stats['total_orders']}\n"
+                    f"**Revenue:** ${stats['total_revenue']:.2f}"
                 ),
                 inline=True
             )
             
-            # Pending orders
-            async with await self.bot.db.get_connection() as db:
-                async with db.execute(
-                    "SELECT COUNT(*) FROM orders WHERE status = 'pending'"
-                ) as cursor:
-                    pending_orders = (await cursor.fetchone())[0]
-                
-                async with db.execute(
-                    "SELECT COUNT(*) FROM orders WHERE status = 'processing'"
-                ) as cursor:
-                    processing_orders = (await cursor.fetchone())[0]
-            
             embed.add_field(
                 name="⏳ Order Status",
                 value=(
-                    f"**Pending:** {pending_orders}\n"
-                    f"**Processing:** {processing_orders}"
+                    f"**Pending:** {stats['pending_orders']}\n"
+                    f"**Processing:** {stats['processing_orders']}"
                 ),
                 inline=True
             )
             
-            # Low stock products
-            async with await self.bot.db.get_connection() as db:
-                async with db.execute(
-                    "SELECT name, stock FROM products WHERE stock < 5 AND is_active = 1"
-                ) as cursor:
-                    low_stock = await cursor.fetchall()
-            
+            low_stock = stats['low_stock']
             if low_stock:
-                low_stock_text = "\n".join([f"• {name}: {stock}" for name, stock in low_stock[:5]])
+                low_stock_text = "\n".join([f"• {name}: {stock}" for name, stock in low_stock])
                 embed.add_field(
                     name="⚠️ Low Stock",
                     value=low_stock_text,
                     inline=False
                 )
             
+            catalog = self.bot.catalog
+            embed.add_field(
+                name="🗂️ Catalog Cache",
+                value=f"**Hits:** {catalog.hits}\n**Misses:** {catalog.misses}\n**Hit rate:** {catalog.hit_rate:.0%}",
+                inline=True
+            )
+            
             view = AdminDashboardView(self.bot)
             await interaction.followup.send(embed=embed, view=view)
             
@@ -118,6 +110,33 @@ class AdminCommands(commands.Cog):
             embed = EmbedBuilder.error("Stock Update Error", "Failed to update stock.")
             await interaction.followup.send(embed=embed)
     
+    @app_commands.command(name="low_stock_threshold", description="Set when a product counts as low on stock")
+    @app_commands.describe(
+        product_id="The product ID",
+        threshold="Alert when stock drops below this (leave empty for the default)"
+    )
+    @is_admin()
+    async def low_stock_threshold(self, interaction: discord.Interaction, product_id: int, threshold: int = None):
+        """Set a product's low-stock threshold"""
+        await interaction.response.defer(ephemeral=True)
+        
+        try:
+            if await self.bot.db.set_low_stock_threshold(product_id, threshold):
+                value = threshold if threshold is not None else f"{Config.LOW_STOCK_THRESHOLD} (default)"
+                embed = EmbedBuilder.success(
+                    "Threshold Updated",
+                    f"Product ID {product_id} is now low on stock below {value}."
+                )
+            else:
+                embed = EmbedBuilder.error("Update Failed", "Product not found.")
+            
+            await interaction.followup.send(embed=embed)
+            
+        except Exception as e:
+            logger.error(f"Error setting low stock threshold: {e}")
+            embed = EmbedBuilder.error("Update Error", "Failed to update the threshold.")
+            await interaction.followup.send(embed=embed)
+    
     @app_commands.command(name="manage_order", description="Manage an order")
     @app_commands.describe(
         order_id="The order ID to manage",
@@ -143,6 +162,8 @@ class AdminCommands(commands.Cog):
             
             # Update order status
             await self.bot.db.update_order_status(order_id.upper(), status)
+            if status in ('completed', 'cancelled'):
+                self.bot.payment_matcher.release(order_id.upper())
             
             # If completing order, update user profile and reduce stock
             if status == 'completed' and order['status'] != 'completed':
@@ -163,15 +184,8 @@ class AdminCommands(commands.Cog):
             
             await interaction.followup.send(embed=embed)
             
-            # Notify customer
-            try:
-                user = self.bot.get_user(order['user_id'])
-                if user:
-                    customer_embed = EmbedBuilder.order_confirmation(order)
-                    customer_embed.title = f"📋 Order {order_id} Updated"
-                    await user.send(embed=customer_embed)
-            except:
-                pass  # User might have DMs disabled
+            # Notify customer in the background
+            self.bot.notifications.notify_order(order_id.upper())
             
         except Exception as e:
             logger.error(f"Error managing order: {e}")
@@ -233,6 +247,280 @@ class AdminCommands(commands.Cog):
             logger.error(f"Error generating sales report: {e}")
             embed = EmbedBuilder.error("Report Error", "Failed to generate sales report.")
             await interaction.followup.send(embed=embed)
+    
+    @app_commands.command(name="reconcile_tx", description="Match a crypto transfer to an order")
+    @app_commands.describe(
+        asset="Which wallet received the transfer",
+        tx_hash="The transaction hash"
+    )
+    @app_commands.choices(asset=[
+        app_commands.Choice(name="Ethereum", value="eth"),
+        app_commands.Choice(name="Litecoin", value="ltc")
+    ])
+    @is_admin()
+    async def reconcile_tx(self, interaction: discord.Interaction, asset: str, tx_hash: str):
+        """Match an incoming transfer by its amount"""
+        await interaction.response.defer(ephemeral=True)
+        
+        try:
+            tx_hash = tx_hash.strip()
+            
+            if asset == 'eth':
+                # Follow it with the other tracked hashes until it is deep enough
+                tracker = self.bot.confirmations
+                tx_hash = tracker.track(tx_hash)
+                await tracker.poll()
+                # The background poll may have finished it first; outcome() covers either case
+                order_id = tracker.outcome(tx_hash)
+                confirmations = tracker.status(tx_hash)
+                
+                if confirmations is not None:
+                    embed = EmbedBuilder.info(
+                        "Waiting For Confirmations",
+                        f"Transaction `{tx_hash}` has {confirmations}/{tracker.confirmations} confirmations. "
+                        "It will be matched automatically once confirmed."
+                    )
+                    await interaction.followup.send(embed=embed)
+                    return
+            else:
+                crypto = CryptoHandler(self.bot.payment_matcher)
+                order_id = await crypto.reconcile_transaction(self.bot.db, asset, tx_hash)
+            
+            if order_id:
+                embed = EmbedBuilder.success(
+                    "Transfer Matched",
+                    f"Transaction `{tx_hash}` paid order `{order_id}`. It is now **processing**."
+                )
+            else:
+                embed = EmbedBuilder.warning(
+                    "No Match",
+                    "The transfer was not matched to exactly one open order. "
+                    "If it is confirmed and reached our wallet it has been queued in `/payment_reviews`."
+                )
+            
+            await interaction.followup.send(embed=embed)
+            
+        except Exception as e:
+            logger.error(f"Error reconciling transaction: {e}")
+            embed = EmbedBuilder.error("Reconcile Error", "Failed to reconcile transaction.")
+            await interaction.followup.send(embed=embed)
+    
+    @app_commands.command(name="payment_reviews", description="List crypto transfers awaiting review")
+    @is_admin()
+    async def payment_reviews(self, interaction: discord.Interaction):
+        """List unmatched or ambiguous transfers"""
+        await interaction.response.defer(ephemeral=True)
+        
+        try:
+            reviews = await self.bot.db.get_payment_reviews()
+            
+            if not reviews:
+                embed = EmbedBuilder.success("Review Queue Empty", "Every transfer has been matched!")
+                await interaction.followup.send(embed=embed)
+                return
+            
+            embed = discord.Embed(
+                title="🔎 Payment Reviews",
+                color=Config.WARNING_COLOR
+            )
+            
+            for review in reviews:
+                candidates = json.loads(review['candidates'] or '[]')
+                embed.add_field(
+                    name=f"Review #{review['id']} - {review['reason'].replace('_', ' ').title()}",
+                    value=(
+                        f"**Amount:** {review['amount']} {review['asset'].upper()}\n"
+                        f"**Tx:** `{review['transaction_hash'] or 'unknown'}`\n"
+                        f"**Candidates:** {', '.join(candidates) or 'none'}"
+                    ),
+                    inline=False
+                )
+            
+            embed.set_footer(text="Use /resolve_review to assign or dismiss a transfer")
+            await interaction.followup.send(embed=embed)
+            
+        except Exception as e:
+            logger.error(f"Error loading payment reviews: {e}")
+            embed = EmbedBuilder.error("Load Error", "Failed to load payment reviews.")
+            await interaction.followup.send(embed=embed)
+    
+    @app_commands.command(name="resolve_review", description="Assign or dismiss a queued crypto transfer")
+    @app_commands.describe(
+        review_id="The review ID",
+        order_id="Order the transfer paid (leave empty to dismiss)"
+    )
+    @is_admin()
+    async def resolve_review(self, interaction: discord.Interaction, review_id: int, order_id: str = None):
+        """Resolve a payment review"""
+        await interaction.response.defer(ephemeral=True)
+        
+        try:
+            review = await self.bot.db.get_payment_review(review_id)
+            if not review or review['status'] != 'open':
+                embed = EmbedBuilder.error("Review Not Found", f"Review #{review_id} is not open.")
+                await interaction.followup.send(embed=embed)
+                return
+            
+            if order_id:
+                order_id = order_id.upper()
+                if not await self.bot.db.mark_order_paid(order_id, review['transaction_hash'] or f"review-{review_id}"):
+                    embed = EmbedBuilder.error("Order Not Open", f"Order `{order_id}` is not waiting on a payment.")
+                    await interaction.followup.send(embed=embed)
+                    return
+                self.bot.payment_matcher.release(order_id)
+                await self.bot.db.record_payment_event(
+                    order_id, review['asset'], f"review:{review_id}", float(review['amount']),
+                    status='completed', transaction_hash=review['transaction_hash']
+                )
+            
+            await self.bot.db.resolve_payment_review(review_id, interaction.user.id, order_id)
+            
+            if order_id:
+                embed = EmbedBuilder.success("Review Resolved", f"Review #{review_id} assigned to order `{order_id}`.")
+            else:
+                embed = EmbedBuilder.success("Review Dismissed", f"Review #{review_id} has been dismissed.")
+            await interaction.followup.send(embed=embed)
+            
+        except Exception as e:
+            logger.error(f"Error resolving payment review: {e}")
+            embed = EmbedBuilder.error("Review Error", "Failed to resolve payment review.")
+            await interaction.followup.send(embed=embed)
+
+    @app_commands.command(name="cashapp_queue", description="Approve or reject claimed CashApp payments")
+    @is_admin()
+    async def cashapp_queue(self, interaction: discord.Interaction):
+        """Show the CashApp verification queue"""
+        await interaction.response.defer(ephemeral=True)
+        
+        try:
+            claims = await self.bot.db.get_claimed_payments('cashapp', CashAppQueueView.PAGE_SIZE)
+            view = CashAppQueueView(self.bot, claims)
+            await interaction.followup.send(embed=view.build_embed(), view=view)
+            
+        except Exception as e:
+            logger.error(f"Error loading CashApp queue: {e}")
+            embed = EmbedBuilder.error("Load Error", "Failed to load the CashApp queue.")
+            await interaction.followup.send(embed=embed)
+
+    @app_commands.command(name="shards", description="Gateway shard health and latency")
+    @is_admin()
+    async def shards(self, interaction: discord.Interaction):
+        """Show per-shard latency, reconnects and event rate"""
+        rows = self.bot.shard_monitor.snapshot()
+        lagging = [row['shard_id'] for row in rows if row['lagging']]
+        
+        embed = discord.Embed(
+            title="🧩 Shard Health",
+            description=(
+                f"**Shards:** {len(rows)} in this process"
+                + (f" of {self.bot.shard_count}" if self.bot.shard_count else "")
+                + (f"\n⚠️ **Lagging:** {', '.join(str(shard_id) for shard_id in lagging)}" if lagging else "")
+            ),
+            color=Config.WARNING_COLOR if lagging else Config.SUCCESS_COLOR
+        )
+        
+        for row in rows[:25]:
+            latency = "n/a" if row['latency_ms'] is None else f"{row['latency_ms']:.0f} ms"
+            embed.add_field(
+                name=f"{'⚠️' if row['lagging'] else '✅'} Shard {row['shard_id']}",
+                value=(
+                    f"**Latency:** {latency}\n"
+                    f"**Guilds:** {row['guilds']}\n"
+                    f"**Reconnects:** {row['reconnects']}\n"
+                    f"**Events/min:** {row['events_per_minute']}"
+                ),
+                inline=True
+            )
+        
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="query_stats", description="Most expensive database query shapes since startup")
+    @app_commands.describe(
+        limit="Number of query shapes to show",
+        sort="What to rank them by"
+    )
+    @app_commands.choices(sort=[
+        app_commands.Choice(name="Total time", value="total"),
+        app_commands.Choice(name="Mean time", value="mean"),
+        app_commands.Choice(name="Slowest run", value="max"),
+        app_commands.Choice(name="Calls", value="calls")
+    ])
+    @is_admin()
+    async def query_stats(self, interaction: discord.Interaction, limit: app_commands.Range[int, 1, 15] = 10, sort: str = "total"):
+        """Show per-statement timing from the query profiler"""
+        queries = self.bot.db.queries
+        top = queries.top(limit, sort)
+        
+        mean_wait = queries.connection_wait / queries.connections if queries.connections else 0
+        embed = discord.Embed(
+            title="🐢 Query Stats",
+            description=(
+                f"**Connections:** {queries.connections} "
+                f"(mean wait {mean_wait * 1000:.2f} ms, max {queries.max_connection_wait * 1000:.2f} ms)\n"
+                f"**Slow query threshold:** {queries.slow_seconds * 1000:.0f} ms"
+            ),
+            color=Config.EMBED_COLOR
+        )
+        
+        for stats in top:
+            embed.add_field(
+                name=f"{stats.total * 1000:.0f} ms total · {stats.calls} calls",
+                value=(
+                    f"```sql\n{stats.template[:900]}\n```"
+                    f"mean {stats.mean * 1000:.2f} ms · max {stats.max * 1000:.2f} ms · {stats.rows} rows"
+                ),
+                inline=False
+            )
+        
+        if not top:
+            embed.description += "\n\nNo queries recorded yet."
+        
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="loop_monitor", description="Event-loop lag monitor")
+    @app_commands.describe(
+        action="Show status, or switch the monitor on or off",
+        asyncio_debug="Also log asyncio's slow-callback warnings (slows the bot slightly); unchanged if left empty"
+    )
+    @app_commands.choices(action=[
+        app_commands.Choice(name="Status", value="status"),
+        app_commands.Choice(name="On", value="on"),
+        app_commands.Choice(name="Off", value="off")
+    ])
+    @is_owner()
+    async def loop_monitor(self, interaction: discord.Interaction, action: str = "status", asyncio_debug: bool = None):
+        """Switch the event-loop lag monitor at runtime and show recent lag"""
+        monitor = self.bot.loop_monitor
+        if action == "on":
+            monitor.start(asyncio_debug=asyncio_debug)
+            logger.info(f"Loop monitor switched on by {interaction.user.id} (asyncio debug {monitor.asyncio_debug})")
+        elif action == "off":
+            await monitor.stop()
+            logger.info(f"Loop monitor switched off by {interaction.user.id}")
+        
+        status = monitor.snapshot()
+        lagging = status['stalls'] > 0
+        
+        def ms(value):
+            return "n/a" if value is None else f"{value:.1f} ms"
+        
+        embed = discord.Embed(
+            title="⏱️ Event Loop",
+            description=(
+                f"**Monitor:** {'on' if status['running'] else 'off'}"
+                + (f" since <t:{int(monitor.started_at)}:R>" if status['running'] else "")
+                + f"\n**asyncio debug:** {'on' if status['asyncio_debug'] else 'off'}"
+                + f"\n**Threshold:** {ms(status['threshold_ms'])}"
+            ),
+            color=Config.WARNING_COLOR if lagging else Config.SUCCESS_COLOR
+        )
+        embed.add_field(name="p50 Lag", value=ms(status['p50_ms']), inline=True)
+        embed.add_field(name="p99 Lag", value=ms(status['p99_ms']), inline=True)
+        embed.add_field(name="Max Lag", value=ms(status['max_ms']), inline=True)
+        embed.add_field(name="Stalls", value=str(status['stalls']), inline=True)
+        embed.set_footer(text="Stalls are logged with the loop thread's stack")
+        
+        await interaction.response.send_message(embed=embed, ephemeral=True)
 
 class AdminDashboardView(discord.ui.View):
     def __init__(self, bot):
@@ -244,15 +532,7 @@ class AdminDashboardView(discord.ui.View):
         await interaction.response.defer(ephemeral=True)
         
         try:
-            async with await self.bot.db.get_connection() as db:
-                async with db.execute(
-                    '''SELECT o.*, u.name as username FROM orders o
-                       LEFT JOIN user_profiles u ON o.user_id = u.user_id
-                       WHERE o.status = 'pending'
-                       ORDER BY o.created_at DESC
-                       LIMIT 10'''
-                ) as cursor:
-                    orders = await cursor.fetchall()
+            orders = await self.bot.db.get_pending_orders(limit=10)
             
             if not orders:
                 embed = EmbedBuilder.info("No Pending Orders", "All orders are up to date!")
@@ -266,12 +546,12 @@ class AdminDashboardView(discord.ui.View):
             
             for order in orders:
                 embed.add_field(
-                    name=f"Order {order[0]}",
+                    name=f"Order {order['id']}",
                     value=(
-                        f"**User:** <@{order[1]}>\n"
-                        f"**Product:** {order[3]}\n"
-                        f"**Total:** ${order[6]:.2f}\n"
-                        f"**Payment:** {order[7].title()}"
+                        f"**User:** <@{order['user_id']}>\n"
+                        f"**Product:** {order['product_name']}\n"
+                        f"**Total:** ${order['total']:.2f}\n"
+                        f"**Payment:** {order['payment_method'].title()}"
                     ),
                     inline=True
                 )
@@ -288,8 +568,7 @@ class AdminDashboardView(discord.ui.View):
         await interaction.response.defer(ephemeral=True)
         
         try:
-            products = await self.bot.db.get_products()
-            low_stock_products = [p for p in products if p['stock'] < 5 and p['is_active']]
+            low_stock_products = await self.bot.db.get_low_stock_products(limit=10)
             
             if not low_stock_products:
                 embed = EmbedBuilder.success("Stock Levels Good", "All products have adequate stock!")
@@ -301,10 +580,13 @@ class AdminDashboardView(discord.ui.View):
                 color=Config.WARNING_COLOR
             )
             
-            for product in low_stock_products[:10]:
+            for product in low_stock_products:
+                threshold = product['low_stock_threshold']
+                if threshold is None:
+                    threshold = Config.LOW_STOCK_THRESHOLD
                 embed.add_field(
                     name=f"{product['name']} (ID: {product['id']})",
-                    value=f"Stock: {product['stock']}\nPrice: ${product['price']:.2f}",
+                    value=f"Stock: {product['stock']} (threshold {threshold})\nPrice: ${product['price']:.2f}",
                     inline=True
                 )
             
@@ -315,6 +597,108 @@ class AdminDashboardView(discord.ui.View):
             embed = EmbedBuilder.error("Load Error", "Failed to load stock information.")
             await interaction.followup.send(embed=embed)
 
+class CashAppQueueView(discord.ui.View):
+    """One screenful of claimed CashApp payments, settled in bulk"""
+    
+    PAGE_SIZE = 25  # Discord limit for select options
+    
+    def __init__(self, bot, claims):
+        super().__init__(timeout=600)
+        self.bot = bot
+        self.claims = claims
+        self.selected = []
+        
+        if claims:
+            self.add_item(CashAppClaimSelect(claims))
+        else:
+            self.approve.disabled = True
+            self.reject.disabled = True
+    
+    def build_embed(self, note=None):
+        if not self.claims:
+            return EmbedBuilder.success("CashApp Queue Empty", note or "No CashApp payments are waiting for review.")
+        
+        embed = discord.Embed(
+            title="💵 CashApp Verification Queue",
+            description=note or "Check each payment in CashApp, select the ones you've verified and approve or reject them.",
+            color=Config.WARNING_COLOR
+        )
+        
+        for claim in self.claims:
+            embed.add_field(
+                name=f"${claim['amount']:.2f} - Order {claim['order_id']}",
+                value=(
+                    f"**Memo:** `{claim['order_id']}`\n"
+                    f"**User:** <@{claim['user_id']}>\n"
+                    f"**Product:** {claim['product_name']}\n"
+                    f"**Claimed:** <t:{claim['claimed_at']}:R>"
+                ),
+                inline=True
+            )
+        
+        embed.set_footer(text=f"Oldest claims first - showing {len(self.claims)}")
+        return embed
+    
+    async def settle(self, interaction, approve):
+        if not self.selected:
+            await interaction.response.send_message("Select at least one payment first.", ephemeral=True)
+            return
+        
+        await interaction.response.defer()
+        
+        try:
+            order_ids = await self.bot.db.settle_claimed_payments(self.selected, approve)
+            action = "approved" if approve else "rejected"
+            logger.info(f"{interaction.user} {action} CashApp payments for orders {', '.join(order_ids)}")
+            for order_id in order_ids:
+                self.bot.notifications.notify_order(order_id)
+            
+            # Show the next screenful
+            claims = await self.bot.db.get_claimed_payments('cashapp', self.PAGE_SIZE)
+            view = CashAppQueueView(self.bot, claims)
+            note = f"{len(order_ids)} payment(s) {action}."
+            skipped = len(self.selected) - len(order_ids)
+            if skipped:
+                note += f" {skipped} skipped: already settled, or the order is no longer open."
+            await interaction.edit_original_response(embed=view.build_embed(note), view=view)
+            self.stop()
+            
+        except Exception as e:
+            logger.error(f"Error settling CashApp payments: {e}")
+            embed = EmbedBuilder.error("Queue Error", "Failed to update the selected payments.")
+            await interaction.followup.send(embed=embed, ephemeral=True)
+    
+    @discord.ui.button(label="Approve Selected", emoji="✅", style=discord.ButtonStyle.success, row=1)
+    async def approve(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.settle(interaction, True)
+    
+    @discord.ui.button(label="Reject Selected", emoji="❌", style=discord.ButtonStyle.danger, row=1)
+    async def reject(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.settle(interaction, False)
+
+class CashAppClaimSelect(discord.ui.Select):
+    def __init__(self, claims):
+        options = [
+            discord.SelectOption(
+                label=f"Order {claim['order_id']} - ${claim['amount']:.2f}",
+                description=claim['product_name'][:100],
+                value=str(claim['id'])
+            )
+            for claim in claims
+        ]
+        
+        super().__init__(
+            placeholder="Select payments to approve or reject...",
+            min_values=1,
+            max_values=len(options),
+            options=options,
+            row=0
+        )
+    
+    async def callback(self, interaction: discord.Interaction):
+        self.view.selected = [int(value) for value in self.values]
+        await interaction.response.defer()
+
 class AddProductModal(discord.ui.Modal):
     def __init__(self, bot):
         self.bot = bot
@@ -46,7 +46,7 @@ class OrderCommands(commands.Cog):
                         f"**Product:** {order['product_name']}\n"
                         f"**Total:** ${order['total']:.2f}\n"
                         f"**Status:** {order['status'].title()}\n"
-                        f"**Date:** <t:{int(order['created_at'])}:R>"
+                        f"**Date:** <t:{EmbedBuilder.unix_time(order['created_at'])}:R>"
                     ),
                     inline=True
                 )
@@ -89,6 +89,10 @@ class OrderCommands(commands.Cog):
             embed = EmbedBuilder.order_confirmation(order)
             
             # Add additional details
+            payment = await self.bot.db.get_order_payment_state(order['id'])
+            if payment['state'] != 'none':
+                embed.add_field(name="Payment", value=payment['state'].title(), inline=True)
+            
             if order['delivery_info']:
                 embed.add_field(name="Delivery Info", value=order['delivery_info'], inline=False)
             
@@ -197,13 +201,9 @@ class SupportTicketModal(discord.ui.Modal):
     async def on_submit(self, interaction: discord.Interaction):
         try:
             # Create support ticket in database
-            async with await self.bot.db.get_connection() as db:
-                await db.execute(
-                    '''INSERT INTO support_tickets (user_id, order_id, subject, description)
-                       VALUES (?, ?, ?, ?)''',
-                    (interaction.user.id, self.order['id'], self.subject.value, self.description.value)
-                )
-                await db.commit()
+            await self.bot.db.create_support_ticket(
+                interaction.user.id, self.order['id'], self.subject.value, self.description.value
+            )
             
             embed = EmbedBuilder.success(
                 "Support Ticket Created",
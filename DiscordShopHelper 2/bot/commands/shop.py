@@ -1,9 +1,15 @@
 import discord
+import re
 from discord.ext import commands
 from discord import app_commands
 from bot.config import Config
+from bot.payments import resilience
+from bot.payments.checkout import CheckoutError, create_payment_link, start_checkout
+from bot.utils.catalog import CatalogCache
 from bot.utils.embeds import EmbedBuilder
-from bot.utils.logger import setup_logger
+from bot.utils.idempotency import interaction_key
+from bot.utils.logger import bind, bind_interaction, setup_logger
+from bot.utils.permissions import enforce_rate_limit, pending_order_limit, rate_limited
 
 logger = setup_logger()
 
@@ -19,24 +25,15 @@ class ShopCommands(commands.Cog):
         app_commands.Choice(name="Discord Nitro", value="nitro"),
         app_commands.Choice(name="Decorations", value="decorations")
     ])
+    @rate_limited()
     async def shop(self, interaction: discord.Interaction, category: str = "all"):
         """Display the shop catalog"""
         await interaction.response.defer(ephemeral=True)
         
         try:
-            # Get products from database
-            if category == "all":
-                products = await self.bot.db.get_products()
-            else:
-                products = await self.bot.db.get_products(category=category)
-            
-            embed = EmbedBuilder.product_catalog(products, category if category != "all" else None)
-            
-            if products:
-                view = ShopView(self.bot, products)
-                await interaction.followup.send(embed=embed, view=view)
-            else:
-                await interaction.followup.send(embed=embed)
+            # Rendered once per catalog version
+            embed, view = await self.bot.catalog.render(category if category != "all" else None)
+            await interaction.followup.send(embed=embed, view=view)
                 
         except Exception as e:
             logger.error(f"Error in shop command: {e}")
@@ -48,6 +45,8 @@ class ShopCommands(commands.Cog):
         product_id="The ID of the product to purchase",
         quantity="Number of items to purchase"
     )
+    @pending_order_limit()
+    @rate_limited()
     async def buy(self, interaction: discord.Interaction, product_id: int, quantity: int = 1):
         """Purchase a product"""
         await interaction.response.defer(ephemeral=True)
@@ -77,15 +76,7 @@ class ShopCommands(commands.Cog):
                 return
             
             # Show purchase confirmation
-            embed = discord.Embed(
-                title="🛒 Purchase Confirmation",
-                color=Config.EMBED_COLOR
-            )
-            embed.add_field(name="Product", value=product['name'], inline=True)
-            embed.add_field(name="Quantity", value=str(quantity), inline=True)
-            embed.add_field(name="Unit Price", value=f"${product['price']:.2f}", inline=True)
-            embed.add_field(name="Total", value=f"${product['price'] * quantity:.2f}", inline=True)
-            embed.set_footer(text="Choose your payment method below")
+            embed = EmbedBuilder.purchase_confirmation(product, quantity)
             
             view = PaymentMethodView(self.bot, product, quantity, interaction.user.id)
             await interaction.followup.send(embed=embed, view=view)
@@ -96,154 +87,422 @@ class ShopCommands(commands.Cog):
             await interaction.followup.send(embed=embed)
 
 class ShopView(discord.ui.View):
-    def __init__(self, bot, products):
-        super().__init__(timeout=300)
-        self.bot = bot
-        self.products = products
+    """One catalog page: product picker, page buttons and categories.
+    
+    Every item is dynamic and carries its own state, so a rendered page can
+    be cached and sent on any number of messages.
+    """
+    
+    def __init__(self, category, page_data, page):
+        super().__init__(timeout=None)
+        
+        if page_data['products']:
+            self.add_item(ProductSelect(category, page, page_data['products']))
+        
+        if page_data['prev_before'] is not None:
+            self.add_item(CatalogPageButton(category, page_data['prev_before'], page - 1, "◀ Previous"))
+        if page_data['next_before'] is not None:
+            self.add_item(CatalogPageButton(category, page_data['next_before'], page + 1, "Next ▶"))
         
         # Add category buttons
-        for category_key, category_info in Config.CATEGORIES.items():
-            button = discord.ui.Button(
-                label=category_info['name'],
-                emoji=category_info['emoji'],
-                custom_id=f"category_{category_key}",
-                style=discord.ButtonStyle.secondary
-            )
-            button.callback = self.category_callback
-            self.add_item(button)
+        for category_key in Config.CATEGORIES:
+            self.add_item(CategoryButton(category_key))
+
+class CategoryButton(discord.ui.DynamicItem[discord.ui.Button], template=r'shop:category:(?P<category>[\w-]+)'):
+    def __init__(self, category):
+        category_info = Config.CATEGORIES.get(category, {'name': category.title(), 'emoji': None})
+        super().__init__(discord.ui.Button(
+            label=category_info['name'],
+            emoji=category_info['emoji'],
+            custom_id=f"shop:category:{category}",
+            style=discord.ButtonStyle.secondary,
+            row=2
+        ))
+        self.category = category
     
-    async def category_callback(self, interaction: discord.Interaction):
-        if not interaction.data or 'custom_id' not in interaction.data:
-            return
-        category = interaction.data['custom_id'].replace('category_', '')
-        
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match['category'])
+    
+    async def callback(self, interaction: discord.Interaction):
         try:
-            products = await self.bot.db.get_products(category=category)
-            embed = EmbedBuilder.product_catalog(products, category)
-            
-            new_view = ShopView(self.bot, products)
-            await interaction.response.edit_message(embed=embed, view=new_view)
+            embed, view = await interaction.client.catalog.render(self.category)
+            await interaction.response.edit_message(embed=embed, view=view)
             
         except Exception as e:
             logger.error(f"Error in category callback: {e}")
             await interaction.response.send_message("Failed to load category.", ephemeral=True)
 
+class CatalogPageButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r'shop:page:(?P<category>[\w-]+):(?P<before>\d+):(?P<page>\d+)'
+):
+    def __init__(self, category, before_id, page, label="Page"):
+        super().__init__(discord.ui.Button(
+            label=label,
+            custom_id=f"shop:page:{category or 'all'}:{before_id}:{page}",
+            style=discord.ButtonStyle.primary,
+            row=1
+        ))
+        self.category = category
+        self.before_id = before_id
+        self.page = page
+    
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        category = None if match['category'] == 'all' else match['category']
+        return cls(category, int(match['before']), int(match['page']))
+    
+    async def callback(self, interaction: discord.Interaction):
+        try:
+            embed, view = await interaction.client.catalog.render(self.category, self.before_id, self.page)
+            await interaction.response.edit_message(embed=embed, view=view)
+            
+        except Exception as e:
+            logger.error(f"Error in catalog page callback: {e}")
+            await interaction.response.send_message("Failed to load page.", ephemeral=True)
+
+class ProductSelect(discord.ui.DynamicItem[discord.ui.Select], template=r'shop:product:(?P<category>[\w-]+):(?P<page>\d+)'):
+    def __init__(self, category, page, products=()):
+        super().__init__(discord.ui.Select(
+            placeholder="Select a product to view details...",
+            custom_id=f"shop:product:{category or 'all'}:{page}",
+            options=[
+                discord.SelectOption(
+                    label=product['name'][:100],
+                    description=f"${product['price']:.2f} - Stock: {product['stock']}",
+                    value=str(product['id'])
+                )
+                for product in products
+            ],
+            row=0
+        ))
+    
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match['category'], int(match['page']))
+    
+    async def callback(self, interaction: discord.Interaction):
+        product = await interaction.client.db.get_product(int(self.item.values[0]))
+        if not product or not product['is_active']:
+            embed = EmbedBuilder.error("Product Unavailable", "This product is currently unavailable.")
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        
+        view = discord.ui.View(timeout=None)
+        if product['stock'] > 0:
+            view.add_item(BuyButton(product['id']))
+        else:
+            view.add_item(NotifyMeButton(product['id']))
+        await interaction.response.send_message(embed=EmbedBuilder.product_detail(product), view=view, ephemeral=True)
+
+class BuyButton(discord.ui.DynamicItem[discord.ui.Button], template=r'shop:buy:(?P<product_id>\d+)'):
+    def __init__(self, product_id):
+        super().__init__(discord.ui.Button(
+            label="Buy",
+            emoji="🛒",
+            custom_id=f"shop:buy:{product_id}",
+            style=discord.ButtonStyle.success
+        ))
+        self.product_id = product_id
+    
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(int(match['product_id']))
+    
+    async def callback(self, interaction: discord.Interaction):
+        bot = interaction.client
+        if not await enforce_rate_limit(interaction, 'buy'):
+            return
+        
+        product = await bot.db.get_product(self.product_id)
+        if not product or not product['is_active'] or product['stock'] < 1:
+            embed = EmbedBuilder.error("Product Unavailable", "This product is out of stock or unavailable.")
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        
+        embed = EmbedBuilder.purchase_confirmation(product, 1)
+        view = PaymentMethodView(bot, product, 1, interaction.user.id)
+        await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+
+class NotifyMeButton(discord.ui.DynamicItem[discord.ui.Button], template=r'shop:notify:(?P<product_id>\d+)'):
+    """Subscribes the user to a DM when an out-of-stock product is restocked"""
+    
+    def __init__(self, product_id):
+        super().__init__(discord.ui.Button(
+            label="Notify Me",
+            emoji="🔔",
+            custom_id=f"shop:notify:{product_id}",
+            style=discord.ButtonStyle.secondary
+        ))
+        self.product_id = product_id
+    
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(int(match['product_id']))
+    
+    async def callback(self, interaction: discord.Interaction):
+        if not await enforce_rate_limit(interaction, 'shop'):
+            return
+        
+        try:
+            if await interaction.client.db.add_stock_subscription(self.product_id, interaction.user.id):
+                embed = EmbedBuilder.success("Subscribed", "We'll DM you when this product is back in stock.")
+            else:
+                embed = EmbedBuilder.info("Already Subscribed", "You'll get a DM when this product is back in stock.")
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            
+        except Exception as e:
+            logger.error(f"Error subscribing to product {self.product_id}: {e}")
+            await interaction.response.send_message("Failed to subscribe. Please try again.", ephemeral=True)
+
 class PaymentMethodView(discord.ui.View):
     def __init__(self, bot, product, quantity, user_id):
-        super().__init__(timeout=300)
-        self.bot = bot
-        self.product = product
+        super().__init__(timeout=None)
+        
+        # Add payment method buttons, hiding methods whose provider is failing
+        for method_key, _ in bot.payments.available_methods():
+            self.add_item(PaymentMethodButton(method_key, product['id'], quantity, user_id))
+
+class PaymentMethodButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r'pay:(?P<method>\w+):(?P<product_id>\d+):(?P<quantity>\d+):(?P<user_id>\d+)'
+):
+    def __init__(self, method, product_id, quantity, user_id):
+        method_info = Config.PAYMENT_METHODS.get(method, {'name': method.title(), 'emoji': None})
+        super().__init__(discord.ui.Button(
+            label=method_info['name'],
+            emoji=method_info['emoji'],
+            custom_id=f"pay:{method}:{product_id}:{quantity}:{user_id}",
+            style=discord.ButtonStyle.primary
+        ))
+        self.method = method
+        self.product_id = product_id
         self.quantity = quantity
         self.user_id = user_id
-        
-        # Add payment method buttons
-        for method_key, method_info in Config.PAYMENT_METHODS.items():
-            if method_info['enabled']:
-                button = discord.ui.Button(
-                    label=method_info['name'],
-                    emoji=method_info['emoji'],
-                    custom_id=f"pay_{method_key}",
-                    style=discord.ButtonStyle.primary
-                )
-                button.callback = self.payment_callback
-                self.add_item(button)
     
-    async def payment_callback(self, interaction: discord.Interaction):
-        if not interaction.data or 'custom_id' not in interaction.data:
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match['method'], int(match['product_id']), int(match['quantity']), int(match['user_id']))
+    
+    async def callback(self, interaction: discord.Interaction):
+        bot = interaction.client
+        bind_interaction(interaction)
+        if interaction.user.id != self.user_id:
+            await interaction.response.send_message("This purchase belongs to someone else.", ephemeral=True)
+            return
+        if not await enforce_rate_limit(interaction, 'checkout'):
             return
-        payment_method = interaction.data['custom_id'].replace('pay_', '')
         
         try:
-            # Create order
-            order_id = await self.bot.db.create_order(
-                self.user_id,
-                self.product['id'],
-                self.quantity,
-                payment_method
-            )
-            
-            if not order_id:
-                embed = EmbedBuilder.error("Order Failed", "Failed to create order. Product may be out of stock.")
-                await interaction.response.send_message(embed=embed, ephemeral=True)
-                return
-            
-            # Get the created order
-            order = await self.bot.db.get_order(order_id)
+            # A double click gets the order the first click created
+            deadline = resilience.interaction_deadline(interaction)
+            order = await bot.interactions.run(interaction_key(interaction), lambda: start_checkout(
+                bot, self.user_id, self.product_id, self.quantity, self.method, deadline=deadline
+            ))
             
             # Show payment instructions
-            embed = EmbedBuilder.payment_instructions(order, payment_method)
+            embed = EmbedBuilder.payment_instructions(order, self.method)
             
-            if payment_method == 'paypal':
-                view = PayPalPaymentView(self.bot, order)
+            if bot.payments.get(self.method).redirect:
+                view = RedirectPaymentView(order)
                 await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
             else:
-                view = CryptoPaymentView(self.bot, order)
+                view = CryptoPaymentView(order)
                 await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
             
+        except CheckoutError as e:
+            embed = EmbedBuilder.error("Order Failed", str(e))
+            await interaction.response.send_message(embed=embed, ephemeral=True)
         except Exception as e:
             logger.error(f"Error in payment callback: {e}")
             embed = EmbedBuilder.error("Payment Error", "Failed to process payment. Please try again.")
             await interaction.response.send_message(embed=embed, ephemeral=True)
 
-class PayPalPaymentView(discord.ui.View):
-    def __init__(self, bot, order):
-        super().__init__(timeout=1800)  # 30 minutes
-        self.bot = bot
-        self.order = order
+class OrderButton(discord.ui.DynamicItem[discord.ui.Button], template=r'order:(?P<action>pay|sent|cancel):(?P<order_id>[A-Z0-9]+)'):
+    """Button acting on one order; the order is loaded from the database on click"""
+    
+    STYLES = {
+        'pay': ("Pay", None, discord.ButtonStyle.success),
+        'sent': ("I've Sent Payment", "✅", discord.ButtonStyle.success),
+        'cancel': ("Cancel Order", "❌", discord.ButtonStyle.danger)
+    }
     
-    @discord.ui.button(label="Pay with PayPal", emoji="💰", style=discord.ButtonStyle.success)
-    async def paypal_payment(self, interaction: discord.Interaction, button: discord.ui.Button):
-        from bot.payments.paypal import PayPalHandler
+    def __init__(self, action, order_id, payment_method=None):
+        label, emoji, style = self.STYLES[action]
+        if action == 'pay' and payment_method in Config.PAYMENT_METHODS:
+            method_info = Config.PAYMENT_METHODS[payment_method]
+            label, emoji = f"Pay with {method_info['name']}", method_info['emoji']
+        
+        super().__init__(discord.ui.Button(
+            label=label,
+            emoji=emoji,
+            custom_id=f"order:{action}:{order_id}",
+            style=style
+        ))
+        self.action = action
+        self.order_id = order_id
+    
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match['action'], match['order_id'])
+    
+    async def load_open_order(self, bot, user_id):
+        """The order, if it belongs to the user and still awaits payment"""
+        order = await bot.db.get_order(self.order_id)
+        if not order or order['user_id'] != user_id or order['status'] != 'pending':
+            return None
+        return order
+    
+    async def callback(self, interaction: discord.Interaction):
+        bot = interaction.client
+        bind_interaction(interaction)
+        bind(order_id=self.order_id)
+        if not await enforce_rate_limit(interaction, 'checkout'):
+            return
+        
+        # ETH payments are confirmed on-chain from the transaction hash
+        if self.action == 'sent':
+            order = await self.load_open_order(bot, interaction.user.id)
+            if order and order['payment_method'] == 'eth':
+                await interaction.response.send_modal(TransactionHashModal(bot, order))
+                return
+        
+        if self.action == 'pay':
+            await interaction.response.defer(ephemeral=True, thinking=True)
         
         try:
-            paypal = PayPalHandler()
-            payment_url = await paypal.create_payment(self.order)
+            # Repeated clicks share the first click's outcome instead of repeating its writes
+            order, result = await bot.interactions.run(
+                interaction_key(interaction), lambda: self.perform(bot, interaction)
+            )
             
-            if payment_url:
-                embed = EmbedBuilder.info(
-                    "PayPal Payment",
-                    f"[Click here to complete your payment]({payment_url})\n\n"
-                    f"Order ID: `{self.order['id']}`\n"
-                    f"Amount: ${self.order['total']:.2f}"
+            if not order:
+                embed = EmbedBuilder.error("Order Closed", f"Order `{self.order_id}` is no longer awaiting payment.")
+            elif self.action == 'pay':
+                embed = self.payment_link_embed(order, result)
+            elif self.action == 'sent':
+                embed = EmbedBuilder.success(
+                    "Payment Confirmation Received",
+                    f"We've received your payment confirmation for order `{order['id']}`.\n"
+                    "Our team will verify the transaction and process your order within 10-30 minutes.\n\n"
+                    "You'll receive a notification once your order is completed."
                 )
-                await interaction.response.send_message(embed=embed, ephemeral=True)
             else:
-                embed = EmbedBuilder.error("Payment Error", "Failed to create PayPal payment.")
-                await interaction.response.send_message(embed=embed, ephemeral=True)
-                
+                embed = EmbedBuilder.warning(
+                    "Order Cancelled",
+                    f"Order `{order['id']}` has been cancelled."
+                )
+            
         except Exception as e:
-            logger.error(f"PayPal payment error: {e}")
-            embed = EmbedBuilder.error("Payment Error", "Failed to process PayPal payment.")
+            logger.error(f"Error handling order {self.action} for {self.order_id}: {e}")
+            embed = EmbedBuilder.error("Payment Error", "Failed to process your request. Please try again.")
+        
+        if interaction.response.is_done():
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        else:
             await interaction.response.send_message(embed=embed, ephemeral=True)
+    
+    async def perform(self, bot, interaction):
+        """Apply the button's action; returns (order or None if not open, action result)"""
+        order = await self.load_open_order(bot, interaction.user.id)
+        if not order:
+            return None, None
+        
+        if self.action == 'pay':
+            payment_url = await create_payment_link(
+                bot, order, deadline=resilience.interaction_deadline(interaction)
+            )
+            return order, payment_url
+        
+        if self.action == 'sent':
+            # Update order status to processing
+            await bot.db.update_order_status(order['id'], 'processing')
+            await bot.db.record_payment_event(
+                order['id'], order['payment_method'], f"claim:{order['id']}",
+                order['total'], status='claimed'
+            )
+            return order, True
+        
+        await bot.payments.cancel(order['payment_method'], order)
+        return order, True
+    
+    @staticmethod
+    def payment_link_embed(order, payment_url):
+        method_name = Config.PAYMENT_METHODS[order['payment_method']]['name']
+        if not payment_url:
+            return EmbedBuilder.error(
+                "Payment Error",
+                f"{method_name} is not responding right now. Please try again in a minute."
+            )
+        
+        return EmbedBuilder.info(
+            f"{method_name} Payment",
+            f"[Click here to complete your payment]({payment_url})\n\n"
+            f"Order ID: `{order['id']}`\n"
+            f"Amount: ${order['total']:.2f}"
+        )
+
+class RedirectPaymentView(discord.ui.View):
+    """For methods where the buyer pays on the provider's own page"""
+    
+    def __init__(self, order):
+        super().__init__(timeout=None)
+        self.add_item(OrderButton('pay', order['id'], order['payment_method']))
 
 class CryptoPaymentView(discord.ui.View):
+    def __init__(self, order):
+        super().__init__(timeout=None)
+        self.add_item(OrderButton('sent', order['id']))
+        self.add_item(OrderButton('cancel', order['id']))
+
+class TransactionHashModal(discord.ui.Modal):
     def __init__(self, bot, order):
-        super().__init__(timeout=1800)  # 30 minutes
         self.bot = bot
         self.order = order
+        super().__init__(title=f"Payment - Order {order['id']}")
+        
+        self.tx_hash = discord.ui.TextInput(
+            label="Transaction Hash",
+            placeholder="0x...",
+            required=True,
+            min_length=66,
+            max_length=66
+        )
+        
+        self.add_item(self.tx_hash)
     
-    @discord.ui.button(label="I've Sent Payment", emoji="✅", style=discord.ButtonStyle.success)
-    async def payment_sent(self, interaction: discord.Interaction, button: discord.ui.Button):
+    async def on_submit(self, interaction: discord.Interaction):
+        bind_interaction(interaction)
+        bind(order_id=self.order['id'])
+        tx_hash = self.tx_hash.value.strip()
+        
+        if not re.fullmatch(r'0x[0-9a-fA-F]{64}', tx_hash):
+            embed = EmbedBuilder.error("Invalid Hash", "That doesn't look like an Ethereum transaction hash.")
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        
+        self.bot.confirmations.track(tx_hash)
+        await self.bot.db.record_payment_event(
+            self.order['id'], 'eth', f"eth-submitted:{tx_hash.lower()}",
+            float(self.order['crypto_amount'] or 0), status='submitted', transaction_hash=tx_hash.lower()
+        )
+        
         embed = EmbedBuilder.success(
             "Payment Confirmation Received",
-            f"We've received your payment confirmation for order `{self.order['id']}`.\n"
-            "Our team will verify the transaction and process your order within 10-30 minutes.\n\n"
+            f"We're watching transaction `{tx_hash}` for order `{self.order['id']}`.\n"
+            f"Your order is confirmed automatically after {Config.ETH_CONFIRMATIONS} block confirmations.\n\n"
             "You'll receive a notification once your order is completed."
         )
         await interaction.response.send_message(embed=embed, ephemeral=True)
         
-        # Update order status to processing
         await self.bot.db.update_order_status(self.order['id'], 'processing')
-    
-    @discord.ui.button(label="Cancel Order", emoji="❌", style=discord.ButtonStyle.danger)
-    async def cancel_order(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.bot.db.update_order_status(self.order['id'], 'cancelled')
-        
-        embed = EmbedBuilder.warning(
-            "Order Cancelled",
-            f"Order `{self.order['id']}` has been cancelled."
-        )
-        await interaction.response.send_message(embed=embed, ephemeral=True)
 
 async def setup(bot):
+    # Buttons carry their state in the custom_id, so they work on any
+    # message the bot ever sent, including ones from before a restart
+    bot.add_dynamic_items(
+        CategoryButton, CatalogPageButton, ProductSelect, BuyButton, NotifyMeButton, PaymentMethodButton, OrderButton
+    )
+    bot.catalog = CatalogCache(bot.db, ShopView)
     await bot.add_cog(ShopCommands(bot))
@@ -4,6 +4,18 @@ class Config:
     # Discord
     DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
     GUILD_ID = int(os.getenv('GUILD_ID', 0))
+    # Sync slash commands to GUILD_ID only (instant updates for development)
+    SYNC_COMMANDS_TO_GUILD = os.getenv('SYNC_COMMANDS_TO_GUILD', 'false').lower() == 'true'
+    # Sync on every start even if the command tree is unchanged
+    FORCE_COMMAND_SYNC = os.getenv('FORCE_COMMAND_SYNC', 'false').lower() == 'true'
+    
+    # Sharding (opt-in); SHARD_IDS is a comma-separated list of the shards this process runs
+    # and needs SHARD_COUNT, the total across all processes
+    SHARDED = os.getenv('SHARDED', 'false').lower() == 'true'
+    SHARD_COUNT = int(os.getenv('SHARD_COUNT', 0)) or None
+    SHARD_IDS = [int(shard_id) for shard_id in os.getenv('SHARD_IDS', '').split(',') if shard_id.strip()] or None
+    # Heartbeat latency above which /shards flags a shard as lagging
+    SHARD_LAG_SECONDS = float(os.getenv('SHARD_LAG_SECONDS', 1.0))
     
     # Admin roles/users
     ADMIN_ROLE_ID = int(os.getenv('ADMIN_ROLE_ID', 0))
@@ -13,22 +25,103 @@ class Config:
     PAYPAL_CLIENT_ID = os.getenv('PAYPAL_CLIENT_ID')
     PAYPAL_CLIENT_SECRET = os.getenv('PAYPAL_CLIENT_SECRET')
     PAYPAL_SANDBOX = os.getenv('PAYPAL_SANDBOX', 'true').lower() == 'true'
+    PAYPAL_WEBHOOK_ID = os.getenv('PAYPAL_WEBHOOK_ID')
     
     # Crypto settings
     ETH_WALLET_ADDRESS = os.getenv('ETH_WALLET_ADDRESS')
     LTC_WALLET_ADDRESS = os.getenv('LTC_WALLET_ADDRESS')
     
+    # Quoted crypto amounts are rounded to this many decimals; each open
+    # order on the same asset gets a unique amount offset by whole steps
+    CRYPTO_QUOTE_DECIMALS = {
+        'eth': int(os.getenv('ETH_QUOTE_DECIMALS', 6)),
+        'ltc': int(os.getenv('LTC_QUOTE_DECIMALS', 5))
+    }
+    CRYPTO_MAX_DUST_STEPS = int(os.getenv('CRYPTO_MAX_DUST_STEPS', 999))
+    # Seconds a fetched USD price is reused for new quotes
+    CRYPTO_PRICE_TTL = int(os.getenv('CRYPTO_PRICE_TTL', 60))
+    
+    # Provider base URLs (point these at tools/provider_simulator.py to test offline)
+    PAYPAL_API_BASE = os.getenv('PAYPAL_API_BASE')  # defaults to sandbox/live by PAYPAL_SANDBOX
+    COINGECKO_API_BASE = os.getenv('COINGECKO_API_BASE', 'https://api.coingecko.com/api/v3')
+    BLOCKCYPHER_API_BASE = os.getenv('BLOCKCYPHER_API_BASE', 'https://api.blockcypher.com/v1/ltc/main')
+    
+    # Chain access and confirmation depth before an order is promoted
+    ETH_RPC_URL = os.getenv('ETH_RPC_URL', 'https://cloudflare-eth.com')
+    ETH_CONFIRMATIONS = int(os.getenv('ETH_CONFIRMATIONS', 12))
+    LTC_CONFIRMATIONS = int(os.getenv('LTC_CONFIRMATIONS', 6))
+    CONFIRMATION_POLL_SECONDS = int(os.getenv('CONFIRMATION_POLL_SECONDS', 15))
+    
+    # Unpaid orders are cancelled this long after creation
+    ORDER_EXPIRY_MINUTES = int(os.getenv('ORDER_EXPIRY_MINUTES', 30))
+    
     # CashApp
     CASHAPP_USERNAME = os.getenv('CASHAPP_USERNAME', '$YourCashApp')
     
+    # Outbound payment provider calls
+    PROVIDER_TIMEOUT = float(os.getenv('PROVIDER_TIMEOUT', 10))
+    PROVIDER_MAX_RETRIES = int(os.getenv('PROVIDER_MAX_RETRIES', 2))
+    PROVIDER_BACKOFF_BASE = float(os.getenv('PROVIDER_BACKOFF_BASE', 0.25))
+    PROVIDER_FAILURE_THRESHOLD = int(os.getenv('PROVIDER_FAILURE_THRESHOLD', 5))
+    PROVIDER_RESET_SECONDS = float(os.getenv('PROVIDER_RESET_SECONDS', 30))
+    
+    # Repeated clicks on the same button within this window reuse the first result
+    INTERACTION_DEDUP_SECONDS = int(os.getenv('INTERACTION_DEDUP_SECONDS', 30))
+    INTERACTION_DEDUP_MAX = int(os.getenv('INTERACTION_DEDUP_MAX', 10000))
+    
+    # Customer DMs: worker tasks, queued messages and messages per second
+    NOTIFY_WORKERS = int(os.getenv('NOTIFY_WORKERS', 4))
+    NOTIFY_QUEUE_SIZE = int(os.getenv('NOTIFY_QUEUE_SIZE', 10000))
+    NOTIFY_RATE = float(os.getenv('NOTIFY_RATE', 5))
+    
+    # Per-user rate limits: bucket -> (requests, window seconds)
+    RATE_LIMITS = {
+        'default': (10, 30),
+        'shop': (10, 30),
+        'buy': (3, 30),
+        'checkout': (3, 60)
+    }
+    MAX_PENDING_ORDERS = int(os.getenv('MAX_PENDING_ORDERS', 3))
+    
+    # Embedded web server (health check, payment webhooks)
+    WEB_HOST = os.getenv('WEB_HOST', '0.0.0.0')
+    WEB_PORT = int(os.getenv('PORT', 8080))
+    # Prometheus /metrics, kept off the public port; METRICS_PORT=0 turns it off
+    METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+    METRICS_PORT = int(os.getenv('METRICS_PORT', 9090))
+    PUBLIC_URL = os.getenv('PUBLIC_URL', '').rstrip('/')
+    
     # Database
     DATABASE_PATH = os.getenv('DATABASE_PATH', 'shop.db')
     
+    # Logging: JSON lines in LOG_FILE, rotated at LOG_MAX_BYTES with LOG_BACKUP_COUNT gzipped copies
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_FILE = os.getenv('LOG_FILE', 'bot.log')
+    LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+    # Statements slower than this are logged with their query plan
+    SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', 100))
+    # Event-loop lag monitor: sample interval, and the lag logged with the loop thread's stack
+    LOOP_MONITOR = os.getenv('LOOP_MONITOR', 'true').lower() == 'true'
+    LOOP_MONITOR_INTERVAL = float(os.getenv('LOOP_MONITOR_INTERVAL', 0.1))
+    LOOP_LAG_WARN_MS = int(os.getenv('LOOP_LAG_WARN_MS', 250))
+    # asyncio debug mode with slow-callback warnings; costly, for tracking a problem down
+    LOOP_ASYNCIO_DEBUG = os.getenv('LOOP_ASYNCIO_DEBUG', 'false').lower() == 'true'
+    
     # Bot settings
     EMBED_COLOR = 0x5865F2  # Discord blurple
     SUCCESS_COLOR = 0x57F287  # Green
     ERROR_COLOR = 0xED4245    # Red
     WARNING_COLOR = 0xFEE75C  # Yellow
+    CATALOG_PAGE_SIZE = 10  # products per catalog page (max 25, the select menu limit)
+    LOW_STOCK_THRESHOLD = 5  # default for products without their own low_stock_threshold
+    # Channel for low-stock alerts, and seconds to wait so several crossings share one message
+    ADMIN_CHANNEL_ID = int(os.getenv('ADMIN_CHANNEL_ID', 0))
+    LOW_STOCK_ALERT_DELAY = int(os.getenv('LOW_STOCK_ALERT_DELAY', 10))
+    
+    # /admin snapshot: full refresh interval, and the shortest gap between refreshes after writes
+    DASHBOARD_REFRESH_SECONDS = int(os.getenv('DASHBOARD_REFRESH_SECONDS', 60))
+    DASHBOARD_MIN_REFRESH_SECONDS = int(os.getenv('DASHBOARD_MIN_REFRESH_SECONDS', 5))
     
     # Shop categories
     CATEGORIES = {
@@ -50,25 +143,44 @@ class Config:
     }
     
     # Payment methods
+    # 'handler' is the PaymentProvider class (module:Class), imported on first use;
+    # 'providers' must be reachable for checkout; 'max_concurrency' and
+    # 'rate_limit' (calls per second, 0 = unlimited) cap calls per method
     PAYMENT_METHODS = {
         'paypal': {
             'name': 'PayPal',
             'emoji': '💰',
-            'enabled': bool(PAYPAL_CLIENT_ID and PAYPAL_CLIENT_SECRET)
+            'enabled': bool(PAYPAL_CLIENT_ID and PAYPAL_CLIENT_SECRET),
+            'handler': 'bot.payments.paypal:PayPalProvider',
+            'providers': ['paypal'],
+            'max_concurrency': int(os.getenv('PAYPAL_MAX_CONCURRENCY', 10)),
+            'rate_limit': float(os.getenv('PAYPAL_RATE_LIMIT', 20))
         },
         'eth': {
             'name': 'Ethereum',
             'emoji': '⟠',
-            'enabled': bool(ETH_WALLET_ADDRESS)
+            'enabled': bool(ETH_WALLET_ADDRESS),
+            'handler': 'bot.payments.crypto:CryptoProvider',
+            'providers': ['coingecko'],
+            'max_concurrency': int(os.getenv('ETH_MAX_CONCURRENCY', 20)),
+            'rate_limit': float(os.getenv('ETH_RATE_LIMIT', 0))
         },
         'ltc': {
             'name': 'Litecoin',
             'emoji': 'Ł',
-            'enabled': bool(LTC_WALLET_ADDRESS)
+            'enabled': bool(LTC_WALLET_ADDRESS),
+            'handler': 'bot.payments.crypto:CryptoProvider',
+            'providers': ['coingecko'],
+            'max_concurrency': int(os.getenv('LTC_MAX_CONCURRENCY', 20)),
+            'rate_limit': float(os.getenv('LTC_RATE_LIMIT', 0))
         },
         'cashapp': {
             'name': 'CashApp',
             'emoji': '💵',
-            'enabled': bool(CASHAPP_USERNAME)
+            'enabled': bool(CASHAPP_USERNAME),
+            'handler': 'bot.payments.cashapp:CashAppProvider',
+            'providers': [],
+            'max_concurrency': int(os.getenv('CASHAPP_MAX_CONCURRENCY', 20)),
+            'rate_limit': float(os.getenv('CASHAPP_RATE_LIMIT', 0))
         }
     }
@@ -6,25 +6,46 @@ from datetime import datetime
 import uuid
 from bot.config import Config
 from bot.database.models import DatabaseModels
+from bot.database.profiler import ProfiledConnection, QueryProfiler
 from bot.utils.logger import setup_logger
+from bot.utils.metrics import DB_SECONDS, timed_methods
 
 logger = setup_logger()
 
+@timed_methods(DB_SECONDS, exclude=('get_connection',))
 class DatabaseManager:
     def __init__(self):
         self.db_path = Config.DATABASE_PATH
         self._connection_pool = None
+        # Timing of every statement, by statement shape
+        self.queries = QueryProfiler()
+        # Bumped on every product write so cached catalog renders can be dropped
+        self.catalog_version = 0
+        # Bumped on every order write so the dashboard snapshot knows to refresh
+        self.orders_version = 0
+        # Called as on_low_stock(product_id, name, stock, threshold) when stock drops below the threshold
+        self.on_low_stock = None
+        # Called as on_restock(product_id, name, stock) when stock goes from zero to positive
+        self.on_restock = None
     
     async def initialize(self):
         """Initialize database and create tables"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with await self.get_connection() as db:
                 # Create tables
                 schema = DatabaseModels.get_schema()
                 for table_name, create_sql in schema.items():
                     await db.execute(create_sql)
                     logger.info(f"Created/verified table: {table_name}")
                 
+                # Add columns introduced after the table was first created
+                for table_name, column, definition in DatabaseModels.get_migrations():
+                    async with db.execute(f'PRAGMA table_info({table_name})') as cursor:
+                        existing = [row[1] for row in await cursor.fetchall()]
+                    if column not in existing:
+                        await db.execute(f'ALTER TABLE {table_name} ADD COLUMN {column} {definition}')
+                        logger.info(f"Added column {table_name}.{column}")
+                
                 # Create indexes
                 indexes = DatabaseModels.get_indexes()
                 for index_sql in indexes:
@@ -38,8 +59,8 @@ class DatabaseManager:
             raise
     
     async def get_connection(self):
-        """Get database connection"""
-        return await aiosqlite.connect(self.db_path)
+        """Get database connection (started by the caller's ``async with``); statements are profiled"""
+        return ProfiledConnection(aiosqlite.connect(self.db_path), self.queries)
     
     # Product methods
     async def create_product(self, name, description, price, category, stock=0, image_url=None):
@@ -51,6 +72,7 @@ class DatabaseManager:
                 (name, description, price, category, stock, image_url)
             )
             await db.commit()
+            self.catalog_version += 1
             return cursor.lastrowid
     
     async def get_products(self, category=None, active_only=True):
@@ -73,6 +95,51 @@ class DatabaseManager:
                 columns = [description[0] for description in cursor.description]
                 return [dict(zip(columns, row)) for row in rows]
     
+    async def get_product_page(self, category=None, before_id=0, limit=10):
+        """Get one catalog page, newest first, by keyset on product id.
+        
+        ``before_id`` is the last (lowest) id of the previous page, or 0 for the
+        first page. Returns the products, the cursors for the neighbouring
+        pages (None if there is none) and the total number of products.
+        """
+        where = 'is_active = 1'
+        params = []
+        if category:
+            where += ' AND category = ?'
+            params.append(category)
+        
+        async with await self.get_connection() as db:
+            sql = f'SELECT * FROM products WHERE {where}'
+            page_params = list(params)
+            if before_id:
+                sql += ' AND id < ?'
+                page_params.append(before_id)
+            
+            async with db.execute(sql + ' ORDER BY id DESC LIMIT ?', page_params + [limit + 1]) as cursor:
+                rows = await cursor.fetchall()
+                columns = [description[0] for description in cursor.description]
+                products = [dict(zip(columns, row)) for row in rows[:limit]]
+            
+            # The previous page starts just above the id that bounds it, limit rows up
+            prev_before = None
+            if before_id:
+                async with db.execute(
+                    f'SELECT id FROM products WHERE {where} AND id >= ? ORDER BY id ASC LIMIT 1 OFFSET ?',
+                    params + [before_id, limit]
+                ) as cursor:
+                    row = await cursor.fetchone()
+                    prev_before = row[0] if row else 0
+            
+            async with db.execute(f'SELECT COUNT(*) FROM products WHERE {where}', params) as cursor:
+                total = (await cursor.fetchone())[0]
+            
+            return {
+                'products': products,
+                'prev_before': prev_before,
+                'next_before': products[-1]['id'] if len(rows) > limit else None,
+                'total': total
+            }
+    
     async def get_product(self, product_id):
         """Get a single product by ID"""
         async with await self.get_connection() as db:
@@ -87,12 +154,14 @@ class DatabaseManager:
         """Update product stock and log the change"""
         async with await self.get_connection() as db:
             # Get current stock
-            async with db.execute('SELECT stock FROM products WHERE id = ?', (product_id,)) as cursor:
+            async with db.execute(
+                'SELECT stock, name, low_stock_threshold FROM products WHERE id = ?', (product_id,)
+            ) as cursor:
                 result = await cursor.fetchone()
                 if not result:
                     return False
                 
-                old_stock = result[0]
+                old_stock, name, threshold = result
             
             # Update stock
             await db.execute(
@@ -112,11 +181,112 @@ class DatabaseManager:
             )
             
             await db.commit()
+            self.catalog_version += 1
+            
+            # Alert only on the write that crosses the threshold, not on every sale below it
+            if threshold is None:
+                threshold = Config.LOW_STOCK_THRESHOLD
+            if old_stock >= threshold > new_stock and self.on_low_stock:
+                self.on_low_stock(product_id, name, new_stock, threshold)
+            if old_stock <= 0 < new_stock and self.on_restock:
+                self.on_restock(product_id, name, new_stock)
             return True
     
+    async def set_low_stock_threshold(self, product_id, threshold):
+        """Set a product's low-stock threshold (None for the default)"""
+        async with await self.get_connection() as db:
+            cursor = await db.execute(
+                'UPDATE products SET low_stock_threshold = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                (threshold, product_id)
+            )
+            await db.commit()
+            return cursor.rowcount == 1
+    
+    async def get_low_stock_products(self, limit=10):
+        """Active products below their low-stock threshold, lowest stock first"""
+        async with await self.get_connection() as db:
+            async with db.execute(
+                '''SELECT * FROM products
+                   WHERE is_active = 1 AND stock < COALESCE(low_stock_threshold, ?)
+                   ORDER BY stock, name
+                   LIMIT ?''',
+                (Config.LOW_STOCK_THRESHOLD, limit)
+            ) as cursor:
+                rows = await cursor.fetchall()
+                columns = [description[0] for description in cursor.description]
+                return [dict(zip(columns, row)) for row in rows]
+    
+    # Back-in-stock subscriptions
+    async def add_stock_subscription(self, product_id, user_id):
+        """Subscribe a user to a product's restock; returns False if already subscribed"""
+        async with await self.get_connection() as db:
+            cursor = await db.execute(
+                'INSERT OR IGNORE INTO stock_subscriptions (product_id, user_id) VALUES (?, ?)',
+                (product_id, user_id)
+            )
+            await db.commit()
+            return cursor.rowcount == 1
+    
+    async def claim_stock_subscribers(self, product_id, limit):
+        """Claim the ``limit`` oldest unclaimed subscriptions of a product; returns (id, user_id) pairs.
+        
+        A claimed subscription is deleted once its DM is sent; unsent claims
+        are released by release_stock_claims on the next start.
+        """
+        async with await self.get_connection() as db:
+            async with db.execute(
+                '''UPDATE stock_subscriptions SET claimed_at = CURRENT_TIMESTAMP
+                   WHERE id IN (
+                       SELECT id FROM stock_subscriptions
+                       WHERE product_id = ? AND claimed_at IS NULL
+                       ORDER BY id LIMIT ?
+                   )
+                   RETURNING id, user_id''',
+                (product_id, limit)
+            ) as cursor:
+                # RETURNING order is unspecified; restore subscription order
+                rows = sorted(await cursor.fetchall())
+            await db.commit()
+            return rows
+    
+    async def delete_stock_subscription(self, subscription_id):
+        """Remove a subscription whose restock DM was sent"""
+        async with await self.get_connection() as db:
+            await db.execute('DELETE FROM stock_subscriptions WHERE id = ?', (subscription_id,))
+            await db.commit()
+    
+    async def release_stock_claims(self, subscription_ids=None):
+        """Unclaim the given subscriptions, or all of them; returns the in-stock products affected
+        
+        Returns (product_id, name, stock) so their subscribers can be notified again.
+        """
+        async with await self.get_connection() as db:
+            if subscription_ids is None:
+                where, params = 'claimed_at IS NOT NULL', ()
+            else:
+                if not subscription_ids:
+                    return []
+                where = f"id IN ({','.join('?' * len(subscription_ids))})"
+                params = tuple(subscription_ids)
+            async with db.execute(
+                f'UPDATE stock_subscriptions SET claimed_at = NULL WHERE {where} RETURNING product_id',
+                params
+            ) as cursor:
+                product_ids = sorted({row[0] for row in await cursor.fetchall()})
+            await db.commit()
+            
+            if not product_ids:
+                return []
+            async with db.execute(
+                f'''SELECT id, name, stock FROM products
+                    WHERE id IN ({','.join('?' * len(product_ids))}) AND stock > 0 AND is_active = 1''',
+                product_ids
+            ) as cursor:
+                return await cursor.fetchall()
+    
     # Order methods
-    async def create_order(self, user_id, product_id, quantity, payment_method):
-        """Create a new order"""
+    async def create_order(self, user_id, product_id, quantity, payment_method, max_pending=None):
+        """Create a new order; returns None if out of stock or the user already has ``max_pending`` unpaid orders"""
         async with await self.get_connection() as db:
             # Get product info
             product = await self.get_product(product_id)
@@ -126,14 +296,21 @@ class DatabaseManager:
             order_id = str(uuid.uuid4())[:8].upper()
             total = product['price'] * quantity
             
-            await db.execute(
+            # The pending-order count is checked in the insert itself, so concurrent checkouts cannot overshoot it
+            cursor = await db.execute(
                 '''INSERT INTO orders 
                    (id, user_id, product_id, product_name, quantity, unit_price, total, payment_method)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-                (order_id, user_id, product_id, product['name'], quantity, product['price'], total, payment_method)
+                   SELECT ?, ?, ?, ?, ?, ?, ?, ?
+                   WHERE ? IS NULL
+                      OR (SELECT COUNT(*) FROM orders WHERE user_id = ? AND status = 'pending') < ?''',
+                (order_id, user_id, product_id, product['name'], quantity, product['price'], total, payment_method,
+                 max_pending, user_id, max_pending)
             )
+            if cursor.rowcount != 1:
+                return None
             
             await db.commit()
+            self.orders_version += 1
             return order_id
     
     async def get_order(self, order_id):
@@ -146,6 +323,29 @@ class DatabaseManager:
                     return dict(zip(columns, row))
                 return None
     
+    async def count_pending_orders(self, user_id):
+        """Count a user's orders still awaiting payment"""
+        async with await self.get_connection() as db:
+            async with db.execute(
+                "SELECT COUNT(*) FROM orders WHERE user_id = ? AND status = 'pending'",
+                (user_id,)
+            ) as cursor:
+                return (await cursor.fetchone())[0]
+    
+    async def get_pending_orders(self, limit=10):
+        """Newest orders awaiting payment"""
+        async with await self.get_connection() as db:
+            async with db.execute(
+                '''SELECT * FROM orders
+                   WHERE status = 'pending'
+                   ORDER BY created_at DESC
+                   LIMIT ?''',
+                (limit,)
+            ) as cursor:
+                rows = await cursor.fetchall()
+                columns = [description[0] for description in cursor.description]
+                return [dict(zip(columns, row)) for row in rows]
+    
     async def get_user_orders(self, user_id, limit=10):
         """Get user's orders"""
         async with await self.get_connection() as db:
@@ -174,6 +374,282 @@ class DatabaseManager:
             
             await db.execute(sql, params)
             await db.commit()
+            self.orders_version += 1
+    
+    async def mark_order_paid(self, order_id, payment_id):
+        """Record a confirmed payment on an open order; returns False if it was already paid or closed"""
+        async with await self.get_connection() as db:
+            cursor = await db.execute(
+                '''UPDATE orders SET status = 'processing', payment_id = ?, updated_at = CURRENT_TIMESTAMP
+                   WHERE id = ? AND status IN ('pending', 'processing') AND payment_id IS NULL''',
+                (payment_id, order_id)
+            )
+            await db.commit()
+            self.orders_version += 1
+            return cursor.rowcount == 1
+    
+    async def get_pending_order_times(self):
+        """Get (order_id, created_at as a Unix timestamp) for orders still awaiting payment"""
+        async with await self.get_connection() as db:
+            async with db.execute(
+                '''SELECT id, CAST(strftime('%s', created_at) AS INTEGER) FROM orders
+                   WHERE status = 'pending' AND payment_id IS NULL'''
+            ) as cursor:
+                return await cursor.fetchall()
+    
+    async def expire_orders(self, order_ids):
+        """Cancel the given orders that are still unpaid; returns the IDs actually cancelled"""
+        if not order_ids:
+            return []
+        
+        placeholders = ', '.join('?' for _ in order_ids)
+        async with await self.get_connection() as db:
+            async with db.execute(
+                f'''UPDATE orders SET status = 'cancelled', updated_at = CURRENT_TIMESTAMP
+                    WHERE id IN ({placeholders}) AND status = 'pending' AND payment_id IS NULL
+                    RETURNING id''',
+                list(order_ids)
+            ) as cursor:
+                expired = [row[0] for row in await cursor.fetchall()]
+            await db.commit()
+            self.orders_version += 1
+            return expired
+    
+    # Payment ledger methods
+    async def record_payment_event(self, order_id, payment_method, idempotency_key, amount,
+                                   status='pending', payment_id=None, transaction_hash=None, webhook_data=None):
+        """Append a payment event; returns False if an event with this key was already recorded"""
+        if webhook_data is not None and not isinstance(webhook_data, str):
+            webhook_data = json.dumps(webhook_data)
+        
+        async with await self.get_connection() as db:
+            cursor = await db.execute(
+                '''INSERT OR IGNORE INTO payments
+                   (order_id, payment_method, payment_id, amount, status, transaction_hash,
+                    webhook_data, idempotency_key, completed_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, CASE WHEN ? = 'completed' THEN CURRENT_TIMESTAMP END)''',
+                (order_id, payment_method, payment_id, amount, status, transaction_hash,
+                 webhook_data, idempotency_key, status)
+            )
+            await db.commit()
+            return cursor.rowcount == 1
+    
+    async def record_payment_attempt(self, order_id, payment_method, amount, payment_id=None, request_data=None):
+        """Record that a payment was started for an order (one row per provider payment)"""
+        return await self.record_payment_event(
+            order_id, payment_method, f"attempt:{payment_method}:{payment_id or order_id}", amount,
+            status='pending', payment_id=payment_id, webhook_data=request_data
+        )
+    
+    async def get_order_payments(self, order_id):
+        """Get every ledger row for an order, oldest first"""
+        async with await self.get_connection() as db:
+            async with db.execute(
+                'SELECT * FROM payments WHERE order_id = ? ORDER BY id ASC',
+                (order_id,)
+            ) as cursor:
+                rows = await cursor.fetchall()
+                columns = [description[0] for description in cursor.description]
+                return [dict(zip(columns, row)) for row in rows]
+    
+    async def get_order_payment_state(self, order_id):
+        """Summarise an order's payment: completed > claimed > submitted > pending > none"""
+        payments = await self.get_order_payments(order_id)
+        statuses = {payment['status'] for payment in payments}
+        
+        for state in ('completed', 'claimed', 'submitted', 'pending'):
+            if state in statuses:
+                break
+        else:
+            state = 'none'
+        
+        return {
+            'order_id': order_id,
+            'state': state,
+            'payments': payments
+        }
+    
+    async def get_payment_order_id(self, payment_id):
+        """Find the order a provider payment ID belongs to"""
+        async with await self.get_connection() as db:
+            async with db.execute(
+                'SELECT order_id FROM payments WHERE payment_id = ? LIMIT 1',
+                (payment_id,)
+            ) as cursor:
+                row = await cursor.fetchone()
+                return row[0] if row else None
+    
+    async def get_transaction_order_id(self, transaction_hash):
+        """Find the order a settled transaction was credited to"""
+        async with await self.get_connection() as db:
+            async with db.execute(
+                "SELECT order_id FROM payments WHERE transaction_hash = ? AND status = 'completed' LIMIT 1",
+                (transaction_hash,)
+            ) as cursor:
+                row = await cursor.fetchone()
+                return row[0] if row else None
+    
+    async def get_submitted_transactions(self, payment_method):
+        """Transaction hashes customers submitted for orders that are still unpaid"""
+        async with await self.get_connection() as db:
+            async with db.execute(
+                '''SELECT p.transaction_hash FROM payments p
+                   JOIN orders o ON o.id = p.order_id
+                   WHERE p.payment_method = ? AND p.status = 'submitted'
+                   AND o.status IN ('pending', 'processing') AND o.payment_id IS NULL''',
+                (payment_method,)
+            ) as cursor:
+                return [row[0] for row in await cursor.fetchall()]
+    
+    async def fail_submitted_transaction(self, payment_method, transaction_hash):
+        """Mark a submitted transaction as failed so it is not tracked again; returns rows updated"""
+        async with await self.get_connection() as db:
+            cursor = await db.execute(
+                '''UPDATE payments SET status = 'failed'
+                   WHERE status = 'submitted' AND payment_method = ? AND transaction_hash = ?''',
+                (payment_method, transaction_hash)
+            )
+            await db.commit()
+            return cursor.rowcount
+    
+    async def get_claimed_payments(self, payment_method, limit=25):
+        """Get payments customers say they sent that still need checking, oldest claim first"""
+        async with await self.get_connection() as db:
+            async with db.execute(
+                '''SELECT p.id, p.order_id, p.amount, o.user_id, o.product_name,
+                          CAST(strftime('%s', p.created_at) AS INTEGER) AS claimed_at
+                   FROM payments p
+                   JOIN orders o ON o.id = p.order_id
+                   WHERE p.payment_method = ? AND p.status = 'claimed'
+                   AND o.status IN ('pending', 'processing') AND o.payment_id IS NULL
+                   ORDER BY p.created_at ASC, p.id ASC
+                   LIMIT ?''',
+                (payment_method, limit)
+            ) as cursor:
+                rows = await cursor.fetchall()
+                columns = [description[0] for description in cursor.description]
+                return [dict(zip(columns, row)) for row in rows]
+    
+    async def settle_claimed_payments(self, payment_ids, approve):
+        """Approve or reject claimed payments in one transaction; returns the order IDs settled.
+        
+        Approving marks each order paid; rejecting cancels it. Claims that were
+        already settled by someone else are skipped. Only orders that actually
+        changed are returned; an approved claim whose order is no longer open
+        (cancelled, or paid another way) is marked rejected instead.
+        """
+        if not payment_ids:
+            return []
+        
+        placeholders = ', '.join('?' for _ in payment_ids)
+        async with await self.get_connection() as db:
+            async with db.execute(
+                f'''UPDATE payments
+                    SET status = ?, completed_at = CASE WHEN ? = 'completed' THEN CURRENT_TIMESTAMP END
+                    WHERE id IN ({placeholders}) AND status = 'claimed'
+                    RETURNING id, order_id''',
+                ['completed' if approve else 'rejected'] * 2 + list(payment_ids)
+            ) as cursor:
+                settled = sorted(await cursor.fetchall())
+            
+            changed = []
+            stale = []
+            for payment_id, order_id in settled:
+                if approve:
+                    statement = '''UPDATE orders SET status = 'processing', payment_id = ?, updated_at = CURRENT_TIMESTAMP
+                                   WHERE id = ? AND status IN ('pending', 'processing') AND payment_id IS NULL
+                                   RETURNING id'''
+                    params = (f"claim-{payment_id}", order_id)
+                else:
+                    statement = '''UPDATE orders SET status = 'cancelled', updated_at = CURRENT_TIMESTAMP
+                                   WHERE id = ? AND status IN ('pending', 'processing') AND payment_id IS NULL
+                                   RETURNING id'''
+                    params = (order_id,)
+                async with db.execute(statement, params) as cursor:
+                    if await cursor.fetchone():
+                        changed.append(order_id)
+                    elif approve:
+                        stale.append(payment_id)
+            
+            if stale:
+                await db.execute(
+                    f'''UPDATE payments SET status = 'rejected', completed_at = NULL
+                        WHERE id IN ({', '.join('?' for _ in stale)})''',
+                    stale
+                )
+                logger.warning(f"Rejected claimed payment(s) {stale}: their orders are no longer open")
+            
+            await db.commit()
+            self.orders_version += 1
+            return changed
+    
+    # Crypto quote methods
+    async def set_order_crypto_quote(self, order_id, crypto_amount, rate, valid_minutes):
+        """Lock the crypto amount and USD rate quoted for an order"""
+        async with await self.get_connection() as db:
+            await db.execute(
+                '''UPDATE orders
+                   SET crypto_amount = ?, quote_rate = ?, quoted_at = CURRENT_TIMESTAMP,
+                       quote_expires_at = datetime('now', ?), updated_at = CURRENT_TIMESTAMP
+                   WHERE id = ?''',
+                (crypto_amount, rate, f"+{valid_minutes} minutes", order_id)
+            )
+            await db.commit()
+    
+    async def get_open_crypto_quotes(self):
+        """Get quoted crypto amounts for orders still waiting on a transfer"""
+        async with await self.get_connection() as db:
+            async with db.execute(
+                '''SELECT id, payment_method, crypto_amount FROM orders
+                   WHERE status IN ('pending', 'processing') AND payment_id IS NULL
+                   AND crypto_amount IS NOT NULL'''
+            ) as cursor:
+                return await cursor.fetchall()
+    
+    # Payment review methods
+    async def add_payment_review(self, asset, amount, transaction_hash, reason, candidates=None):
+        """Queue a transfer that could not be matched to exactly one order; returns None if already queued"""
+        async with await self.get_connection() as db:
+            cursor = await db.execute(
+                '''INSERT OR IGNORE INTO payment_reviews (asset, amount, transaction_hash, reason, candidates)
+                   VALUES (?, ?, ?, ?, ?)''',
+                (asset, amount, transaction_hash, reason, json.dumps(candidates or []))
+            )
+            await db.commit()
+            return cursor.lastrowid if cursor.rowcount == 1 else None
+    
+    async def get_payment_reviews(self, status='open', limit=10):
+        """Get queued payment reviews, oldest first"""
+        async with await self.get_connection() as db:
+            async with db.execute(
+                'SELECT * FROM payment_reviews WHERE status = ? ORDER BY created_at ASC LIMIT ?',
+                (status, limit)
+            ) as cursor:
+                rows = await cursor.fetchall()
+                columns = [description[0] for description in cursor.description]
+                return [dict(zip(columns, row)) for row in rows]
+    
+    async def get_payment_review(self, review_id):
+        """Get a single payment review by ID"""
+        async with await self.get_connection() as db:
+            async with db.execute('SELECT * FROM payment_reviews WHERE id = ?', (review_id,)) as cursor:
+                row = await cursor.fetchone()
+                if row:
+                    columns = [description[0] for description in cursor.description]
+                    return dict(zip(columns, row))
+                return None
+    
+    async def resolve_payment_review(self, review_id, admin_id, order_id=None):
+        """Close a payment review, optionally recording the order it belonged to"""
+        async with await self.get_connection() as db:
+            cursor = await db.execute(
+                '''UPDATE payment_reviews
+                   SET status = ?, order_id = ?, resolved_by = ?, resolved_at = CURRENT_TIMESTAMP
+                   WHERE id = ? AND status = ?''',
+                ('matched' if order_id else 'dismissed', order_id, admin_id, review_id, 'open')
+            )
+            await db.commit()
+            return cursor.rowcount == 1
     
     # User profile methods
     async def update_user_profile(self, user_id, order_total):
@@ -213,6 +689,34 @@ class DatabaseManager:
                 return None
     
     # Analytics methods
+    async def get_dashboard_stats(self, days=7, low_stock_threshold=5, low_stock_limit=5):
+        """Everything /admin shows, from one statement over orders and products"""
+        async with await self.get_connection() as db:
+            async with db.execute(
+                '''SELECT
+                       SUM(CASE WHEN status = 'completed' AND created_at >= datetime('now', ?) THEN 1 ELSE 0 END),
+                       SUM(CASE WHEN status = 'completed' AND created_at >= datetime('now', ?) THEN total ELSE 0 END),
+                       SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END),
+                       SUM(CASE WHEN status = 'processing' THEN 1 ELSE 0 END),
+                       (SELECT json_group_array(json_array(name, stock)) FROM (
+                           SELECT name, stock FROM products
+                           WHERE stock < COALESCE(low_stock_threshold, ?) AND is_active = 1
+                           ORDER BY stock, name
+                           LIMIT ?
+                       ))
+                   FROM orders''',
+                (f'-{days} days', f'-{days} days', low_stock_threshold, low_stock_limit)
+            ) as cursor:
+                completed, revenue, pending, processing, low_stock = await cursor.fetchone()
+            
+            return {
+                'total_orders': completed or 0,
+                'total_revenue': revenue or 0,
+                'pending_orders': pending or 0,
+                'processing_orders': processing or 0,
+                'low_stock': [tuple(item) for item in json.loads(low_stock or '[]')]
+            }
+    
     async def get_sales_analytics(self, days=30):
         """Get sales analytics for the last N days"""
         async with await self.get_connection() as db:
@@ -251,3 +755,32 @@ class DatabaseManager:
                 'category_sales': category_sales,
                 'top_products': top_products
             }
+    
+    # Support ticket methods
+    async def create_support_ticket(self, user_id, order_id, subject, description):
+        """Open a support ticket; returns its ID"""
+        async with await self.get_connection() as db:
+            cursor = await db.execute(
+                '''INSERT INTO support_tickets (user_id, order_id, subject, description)
+                   VALUES (?, ?, ?, ?)''',
+                (user_id, order_id, subject, description)
+            )
+            await db.commit()
+            return cursor.lastrowid
+    
+    async def get_setting(self, key, default=None):
+        """Get a value from the settings table"""
+        async with await self.get_connection() as db:
+            async with db.execute('SELECT value FROM settings WHERE key = ?', (key,)) as cursor:
+                row = await cursor.fetchone()
+                return row[0] if row else default
+    
+    async def set_setting(self, key, value):
+        """Insert or replace a value in the settings table"""
+        async with await self.get_connection() as db:
+            await db.execute(
+                '''INSERT INTO settings (key, value) VALUES (?, ?)
+                   ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = CURRENT_TIMESTAMP''',
+                (key, str(value))
+            )
+            await db.commit()
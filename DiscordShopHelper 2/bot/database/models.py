@@ -103,6 +103,33 @@ class DatabaseModels:
                 )
             ''',
             
+            'payment_reviews': '''
+                CREATE TABLE IF NOT EXISTS payment_reviews (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    asset TEXT NOT NULL,
+                    amount TEXT NOT NULL,
+                    transaction_hash TEXT,
+                    reason TEXT NOT NULL,
+                    candidates TEXT,
+                    status TEXT DEFAULT 'open',
+                    order_id TEXT,
+                    resolved_by INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    resolved_at TIMESTAMP
+                )
+            ''',
+            
+            'stock_subscriptions': '''
+                CREATE TABLE IF NOT EXISTS stock_subscriptions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    product_id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    claimed_at TIMESTAMP,
+                    FOREIGN KEY (product_id) REFERENCES products (id)
+                )
+            ''',
+            
             'settings': '''
                 CREATE TABLE IF NOT EXISTS settings (
                     key TEXT PRIMARY KEY,
@@ -112,6 +139,19 @@ class DatabaseModels:
             '''
         }
     
+    @staticmethod
+    def get_migrations():
+        """Columns added after the original schema, as (table, column, definition)"""
+        return [
+            ('orders', 'crypto_amount', 'TEXT'),
+            ('payments', 'idempotency_key', 'TEXT'),
+            ('orders', 'quote_rate', 'REAL'),
+            ('orders', 'quoted_at', 'TIMESTAMP'),
+            ('orders', 'quote_expires_at', 'TIMESTAMP'),
+            ('products', 'low_stock_threshold', 'INTEGER'),  # NULL = Config.LOW_STOCK_THRESHOLD
+            ('stock_subscriptions', 'claimed_at', 'TIMESTAMP')  # set while the restock DM is queued
+        ]
+    
     @staticmethod
     def get_indexes():
         return [
@@ -120,7 +160,14 @@ class DatabaseModels:
             'CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at)',
             'CREATE INDEX IF NOT EXISTS idx_products_category ON products(category)',
             'CREATE INDEX IF NOT EXISTS idx_products_active ON products(is_active)',
+            'CREATE INDEX IF NOT EXISTS idx_products_catalog ON products(is_active, category, id)',
             'CREATE INDEX IF NOT EXISTS idx_payments_order_id ON payments(order_id)',
+            'CREATE UNIQUE INDEX IF NOT EXISTS idx_payments_idempotency_key ON payments(idempotency_key)',
+            'CREATE INDEX IF NOT EXISTS idx_payments_status ON payments(payment_method, status)',
             'CREATE INDEX IF NOT EXISTS idx_support_tickets_user_id ON support_tickets(user_id)',
-            'CREATE INDEX IF NOT EXISTS idx_support_tickets_status ON support_tickets(status)'
+            'CREATE INDEX IF NOT EXISTS idx_support_tickets_status ON support_tickets(status)',
+            'CREATE INDEX IF NOT EXISTS idx_payment_reviews_status ON payment_reviews(status)',
+            'CREATE UNIQUE INDEX IF NOT EXISTS idx_payment_reviews_tx ON payment_reviews(transaction_hash)',
+            # One subscription per user and product; (product_id, ...) also serves the FIFO claim
+            'CREATE UNIQUE INDEX IF NOT EXISTS idx_stock_subscriptions_product_user ON stock_subscriptions(product_id, user_id)'
         ]
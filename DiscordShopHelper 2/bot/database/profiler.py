@@ -0,0 +1,182 @@
+import re
+import time
+from bot.config import Config
+from bot.utils.logger import setup_logger
+
+logger = setup_logger()
+
+_IN_LIST = re.compile(r'IN\s*\((\s*\?\s*,)*\s*\?\s*\)', re.IGNORECASE)
+_NUMBER = re.compile(r"(?<![\w'])\d+(\.\d+)?(?![\w'])")
+_SPACE = re.compile(r'\s+')
+
+def statement_template(sql):
+    """Shape of a statement: whitespace collapsed, IN lists and numeric literals folded"""
+    sql = _SPACE.sub(' ', sql).strip()
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _NUMBER.sub('?', sql)
+
+class QueryStats:
+    """Totals for one statement template"""
+    
+    def __init__(self, template):
+        self.template = template
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+    
+    @property
+    def mean(self):
+        return self.total / self.calls if self.calls else 0.0
+
+class QueryProfiler:
+    """Per-template timing, rows returned and connection wait since startup.
+    
+    Statements slower than ``slow_seconds`` are logged; the first slow run of
+    each template also logs its ``EXPLAIN QUERY PLAN``.
+    """
+    
+    def __init__(self, slow_seconds=None):
+        self.slow_seconds = slow_seconds if slow_seconds is not None else Config.SLOW_QUERY_MS / 1000
+        self.stats = {}
+        self.connections = 0
+        self.connection_wait = 0.0
+        self.max_connection_wait = 0.0
+        self._explained = set()
+    
+    def record_wait(self, seconds):
+        self.connections += 1
+        self.connection_wait += seconds
+        self.max_connection_wait = max(self.max_connection_wait, seconds)
+    
+    def record(self, template, seconds, rows=0, new_call=True, statement_seconds=None):
+        """Add execute or fetch time; ``statement_seconds`` is the statement's running total"""
+        stats = self.stats.get(template)
+        if stats is None:
+            stats = self.stats[template] = QueryStats(template)
+        if new_call:
+            stats.calls += 1
+        stats.total += seconds
+        stats.rows += rows
+        stats.max = max(stats.max, statement_seconds or seconds)
+        return stats
+    
+    def top(self, limit=10, key='total'):
+        """The most expensive templates by total, mean or max time"""
+        return sorted(self.stats.values(), key=lambda stats: getattr(stats, key), reverse=True)[:limit]
+    
+    async def report_slow(self, db, sql, params, template, seconds):
+        """Log a slow statement, with its query plan the first time the template is slow"""
+        if template in self._explained:
+            logger.warning(f"Slow query ({seconds * 1000:.1f} ms): {template}")
+            return
+        
+        self._explained.add(template)
+        try:
+            async with db.execute(f'EXPLAIN QUERY PLAN {sql}', params or ()) as cursor:
+                plan = [row[-1] for row in await cursor.fetchall()]
+        except Exception as e:
+            plan = [f"unavailable: {e}"]
+        logger.warning(f"Slow query ({seconds * 1000:.1f} ms): {template} | plan: {'; '.join(plan)}")
+
+class ProfiledConnection:
+    """An aiosqlite connection whose statements are timed by a QueryProfiler.
+    
+    Used exactly like the connection it wraps: ``async with`` opens it, and
+    ``execute`` can be awaited or used with ``async with``.
+    """
+    
+    def __init__(self, connector, profiler):
+        self._connector = connector
+        self._db = None
+        self.profiler = profiler
+    
+    async def __aenter__(self):
+        started = time.perf_counter()
+        self._db = await self._connector.__aenter__()
+        self.profiler.record_wait(time.perf_counter() - started)
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        return await self._connector.__aexit__(exc_type, exc, tb)
+    
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+    
+    def execute(self, sql, parameters=None):
+        return _Statement(self, sql, parameters, self._db.execute)
+    
+    def executemany(self, sql, parameters):
+        parameters = list(parameters)
+        # A slow executemany is explained with its first row of parameters
+        first = parameters[0] if parameters else None
+        return _Statement(self, sql, first, lambda sql, _: self._db.executemany(sql, parameters))
+    
+    async def _run(self, sql, parameters, runner):
+        template = statement_template(sql)
+        started = time.perf_counter()
+        cursor = await runner(sql, parameters)
+        elapsed = time.perf_counter() - started
+        self.profiler.record(template, elapsed)
+        return ProfiledCursor(cursor, self, sql, parameters, template, elapsed)
+
+class _Statement:
+    def __init__(self, connection, sql, parameters, runner):
+        self.connection = connection
+        self.args = (sql, parameters, runner)
+        self.cursor = None
+    
+    def __await__(self):
+        return self._start().__await__()
+    
+    async def _start(self):
+        self.cursor = await self.connection._run(*self.args)
+        if self.cursor.elapsed >= self.connection.profiler.slow_seconds:
+            await self.cursor.report_slow()
+        return self.cursor
+    
+    async def __aenter__(self):
+        return await self._start()
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.cursor.close()
+
+class ProfiledCursor:
+    """Cursor proxy adding fetch time and rows to its statement's stats"""
+    
+    def __init__(self, cursor, connection, sql, parameters, template, elapsed):
+        self._cursor = cursor
+        self.connection = connection
+        self.sql = sql
+        self.parameters = parameters
+        self.template = template
+        self.elapsed = elapsed
+        self._reported = False
+    
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+    
+    async def report_slow(self):
+        if not self._reported:
+            self._reported = True
+            await self.connection.profiler.report_slow(
+                self.connection._db, self.sql, self.parameters, self.template, self.elapsed
+            )
+    
+    async def _fetch(self, fetch, count):
+        started = time.perf_counter()
+        result = await fetch()
+        seconds = time.perf_counter() - started
+        self.elapsed += seconds
+        self.connection.profiler.record(
+            self.template, seconds, count(result), new_call=False, statement_seconds=self.elapsed
+        )
+        if self.elapsed >= self.connection.profiler.slow_seconds:
+            await self.report_slow()
+        return result
+    
+    async def fetchone(self):
+        return await self._fetch(self._cursor.fetchone, lambda row: 0 if row is None else 1)
+    
+    async def fetchall(self):
+        return await self._fetch(self._cursor.fetchall, len)
@@ -1,11 +1,13 @@
 import asyncio
 from bot.config import Config
+from bot.payments.registry import PaymentProvider
 from bot.utils.logger import setup_logger
 
 logger = setup_logger()
 
 class CashAppHandler:
-    def __init__(self):
+    def __init__(self, db=None):
+        self.db = db
         self.username = Config.CASHAPP_USERNAME
     
     def get_payment_instructions(self, order):
@@ -18,20 +20,18 @@ class CashAppHandler:
         }
     
     async def verify_payment(self, order_id, amount, sender_info=None):
-        """Verify CashApp payment (manual process)"""
-        # CashApp doesn't have a public API for automatic verification
-        # This would typically involve manual verification by admins
-        # or integration with accounting software
+        """Check whether an admin has approved a CashApp payment for this order"""
+        # CashApp has no public API, so claims are approved by hand from the
+        # /cashapp_queue admin view and recorded in the payments ledger
+        if not self.db:
+            return False
         
-        logger.info(f"CashApp payment verification requested for order {order_id}")
-        
-        # For now, this is a placeholder
-        # In production, you might:
-        # 1. Store payment claims in database for admin review
-        # 2. Send notifications to admin channel
-        # 3. Implement a review system
-        
-        return False  # Requires manual verification
+        payments = await self.db.get_order_payments(order_id)
+        return any(
+            payment['payment_method'] == 'cashapp' and payment['status'] == 'completed'
+            and abs(payment['amount'] - amount) < 0.01
+            for payment in payments
+        )
     
     def create_payment_request(self, order):
         """Create payment request data"""
@@ -43,3 +43,20 @@ class CashAppHandler:
             'memo': order['id'],
             'status': 'pending_verification'
         }
+
+class CashAppProvider(PaymentProvider):
+    """Buyer sends money by hand; admins approve claims from /cashapp_queue"""
+    
+    limited_steps = ()
+    
+    def __init__(self, bot, method, info):
+        super().__init__(bot, method, info)
+        self.handler = CashAppHandler(bot.db)
+    
+    async def quote(self, order, deadline=None):
+        request = self.handler.create_payment_request(order)
+        await self.bot.db.record_payment_attempt(order['id'], 'cashapp', order['total'], request_data=request)
+        return order
+    
+    async def verify(self, order, reference=None, deadline=None):
+        return await self.handler.verify_payment(order['id'], order['total'])
@@ -0,0 +1,35 @@
+from bot.config import Config
+from bot.utils.logger import bind, setup_logger
+
+logger = setup_logger()
+
+class CheckoutError(Exception):
+    """Checkout step failed; the message is safe to show the customer"""
+
+async def start_checkout(bot, user_id, product_id, quantity, payment_method, deadline=None):
+    """Create an order and prepare its payment; returns the order dict"""
+    if not bot.payments.is_available(payment_method):
+        raise CheckoutError("This payment method is unavailable right now. Please pick another.")
+    
+    order_id = await bot.db.create_order(
+        user_id, product_id, quantity, payment_method, max_pending=Config.MAX_PENDING_ORDERS
+    )
+    if not order_id:
+        if await bot.db.count_pending_orders(user_id) >= Config.MAX_PENDING_ORDERS:
+            raise CheckoutError("You have too many unpaid orders. Pay or cancel one before starting another.")
+        raise CheckoutError("Failed to create order. Product may be out of stock.")
+    
+    bind(order_id=order_id)
+    bot.order_expiry.schedule(order_id)
+    order = await bot.db.get_order(order_id)
+    
+    quoted = await bot.payments.quote(payment_method, order, deadline=deadline)
+    if not quoted:
+        await bot.payments.cancel(payment_method, order)
+        raise CheckoutError("Could not price this order right now. Please try again.")
+    
+    return quoted
+
+async def create_payment_link(bot, order, deadline=None):
+    """Start the provider-side payment for an order; returns the buyer's URL or None"""
+    return await bot.payments.create(order['payment_method'], order, deadline=deadline)
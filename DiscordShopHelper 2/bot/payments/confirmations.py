@@ -0,0 +1,138 @@
+import asyncio
+import time
+from collections import OrderedDict
+from bot.config import Config
+from bot.payments.crypto import CryptoHandler
+from bot.utils.logger import setup_logger
+
+logger = setup_logger()
+
+class ConfirmationTracker:
+    """Follows candidate ETH transactions until they reach the confirmation depth.
+    
+    Every poll sends one batched JSON-RPC request (``eth_blockNumber`` plus one
+    ``eth_getTransactionByHash`` per tracked hash), so a single round trip
+    advances all pending transactions to the new block height. Confirmed
+    transfers to our wallet are matched to an order by amount. Polls run one
+    at a time, whether from the background loop or /reconcile_tx.
+    """
+    
+    # Outcomes of finished hashes kept for callers whose poll was beaten to them
+    FINISHED_HISTORY = 1000
+    
+    def __init__(self, db, matcher, rpc_url=None, confirmations=None, poll_interval=None, max_age=None):
+        self.db = db
+        self.crypto = CryptoHandler(matcher)
+        self.rpc_url = rpc_url or Config.ETH_RPC_URL
+        self.confirmations = confirmations or Config.ETH_CONFIRMATIONS
+        self.poll_interval = poll_interval or Config.CONFIRMATION_POLL_SECONDS
+        self.max_age = max_age or 6 * 3600  # forget hashes the chain never saw
+        self.head = None
+        self._pending = {}  # tx_hash -> {'added': ts, 'confirmations': n}
+        self._finished = OrderedDict()  # tx_hash -> order_id or None
+        self._lock = asyncio.Lock()
+        self._task = None
+    
+    def track(self, tx_hash):
+        """Start following a transaction hash"""
+        tx_hash = tx_hash.lower()
+        if tx_hash not in self._pending:
+            self._pending[tx_hash] = {'added': time.time(), 'confirmations': 0}
+        return tx_hash
+    
+    def status(self, tx_hash):
+        """Current confirmation count of a tracked hash, or None if not tracked"""
+        entry = self._pending.get(tx_hash.lower())
+        return entry['confirmations'] if entry else None
+    
+    def outcome(self, tx_hash):
+        """Order a recently finished hash was matched to, or None"""
+        return self._finished.get(tx_hash.lower())
+    
+    @property
+    def pending_count(self):
+        return len(self._pending)
+    
+    async def poll(self):
+        """Advance every tracked hash; returns {tx_hash: order_id or None} for hashes that finished"""
+        async with self._lock:
+            finished = await self._poll()
+        
+        for tx_hash, order_id in finished.items():
+            self._finished[tx_hash] = order_id
+        while len(self._finished) > self.FINISHED_HISTORY:
+            self._finished.popitem(last=False)
+        return finished
+    
+    async def _poll(self):
+        if not self._pending:
+            return {}
+        
+        hashes = list(self._pending)
+        calls = [('eth_blockNumber', [])] + [('eth_getTransactionByHash', [h]) for h in hashes]
+        
+        try:
+            results = await self.crypto.eth_rpc_batch(calls, self.rpc_url)
+        except Exception as e:
+            logger.error(f"Confirmation poll failed: {e}")
+            return {}
+        
+        if not results or not results[0]:
+            return {}
+        
+        self.head = int(results[0], 16)
+        wallet = (self.crypto.eth_address or '').lower()
+        finished = {}
+        now = time.time()
+        
+        for tx_hash, tx in zip(hashes, results[1:]):
+            entry = self._pending.get(tx_hash)
+            if entry is None:
+                continue
+            
+            if not tx:
+                if now - entry['added'] > self.max_age:
+                    logger.warning(f"Dropping ETH transaction {tx_hash}: never seen on chain")
+                    self._pending.pop(tx_hash, None)
+                    await self.db.fail_submitted_transaction('eth', tx_hash)
+                continue
+            
+            to, amount, confirmations = CryptoHandler.parse_eth_transaction(tx, self.head)
+            entry['confirmations'] = confirmations
+            if confirmations < self.confirmations:
+                continue
+            
+            self._pending.pop(tx_hash, None)
+            if to != wallet:
+                logger.warning(f"ETH transaction {tx_hash} does not pay the shop wallet")
+                # Otherwise get_submitted_transactions hands it back on every restart
+                await self.db.fail_submitted_transaction('eth', tx_hash)
+                finished[tx_hash] = None
+                continue
+            
+            finished[tx_hash] = await self.crypto.matcher.reconcile(self.db, 'eth', amount, tx_hash)
+        
+        return finished
+    
+    def start(self):
+        """Start the background polling task"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the background polling task"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self):
+        while True:
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.error(f"Confirmation tracker error: {e}")
+            await asyncio.sleep(self.poll_interval)
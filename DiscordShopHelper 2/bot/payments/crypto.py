@@ -1,55 +1,74 @@
-import aiohttp
 import asyncio
+import time
+from decimal import Decimal
 from bot.config import Config
+from bot.payments import resilience
+from bot.payments.matching import PaymentMatcher
+from bot.payments.registry import PaymentProvider
 from bot.utils.logger import setup_logger
 
 logger = setup_logger()
 
+# coin -> (USD price, monotonic time fetched), shared by every handler
+_price_cache = {}
+_price_locks = {}
+
 class CryptoHandler:
-    def __init__(self):
+    # CoinGecko IDs
+    COINS = {
+        'eth': 'ethereum',
+        'ltc': 'litecoin'
+    }
+    
+    def __init__(self, matcher=None):
         self.eth_address = Config.ETH_WALLET_ADDRESS
         self.ltc_address = Config.LTC_WALLET_ADDRESS
+        self.matcher = matcher or PaymentMatcher()
     
-    async def get_eth_price(self):
-        """Get current ETH price in USD"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    "https://api.coingecko.com/api/v3/simple/price?ids=ethereum&vs_currencies=usd"
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data['ethereum']['usd']
-                    return None
-        except Exception as e:
-            logger.error(f"Error fetching ETH price: {e}")
+    async def get_price(self, crypto_type, deadline=None):
+        """Get the USD price of a coin, reusing a recent fetch for up to CRYPTO_PRICE_TTL seconds"""
+        coin = self.COINS.get(crypto_type.lower())
+        if not coin:
             return None
+        
+        cached = _price_cache.get(coin)
+        if cached and time.monotonic() - cached[1] < Config.CRYPTO_PRICE_TTL:
+            return cached[0]
+        
+        # Concurrent checkouts wait for one fetch instead of each calling the API
+        lock = _price_locks.setdefault(coin, asyncio.Lock())
+        async with lock:
+            cached = _price_cache.get(coin)
+            if cached and time.monotonic() - cached[1] < Config.CRYPTO_PRICE_TTL:
+                return cached[0]
+            
+            try:
+                response = await resilience.request(
+                    'coingecko', 'GET',
+                    f"{Config.COINGECKO_API_BASE}/simple/price?ids={coin}&vs_currencies=usd",
+                    deadline=deadline, idempotent=True
+                )
+                if response and response.status == 200:
+                    price = response.data[coin]['usd']
+                    _price_cache[coin] = (price, time.monotonic())
+                    return price
+                return None
+            except Exception as e:
+                logger.error(f"Error fetching {crypto_type.upper()} price: {e}")
+                return None
+    
+    async def get_eth_price(self, deadline=None):
+        """Get current ETH price in USD"""
+        return await self.get_price('eth', deadline)
     
-    async def get_ltc_price(self):
+    async def get_ltc_price(self, deadline=None):
         """Get current LTC price in USD"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    "https://api.coingecko.com/api/v3/simple/price?ids=litecoin&vs_currencies=usd"
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data['litecoin']['usd']
-                    return None
-        except Exception as e:
-            logger.error(f"Error fetching LTC price: {e}")
-            return None
+        return await self.get_price('ltc', deadline)
     
-    async def calculate_crypto_amount(self, usd_amount, crypto_type):
+    async def calculate_crypto_amount(self, usd_amount, crypto_type, deadline=None):
         """Calculate crypto amount needed for USD amount"""
         try:
-            if crypto_type.lower() == 'eth':
-                price = await self.get_eth_price()
-            elif crypto_type.lower() == 'ltc':
-                price = await self.get_ltc_price()
-            else:
-                return None
-            
+            price = await self.get_price(crypto_type, deadline)
             if price:
                 return usd_amount / price
             return None
@@ -57,69 +76,178 @@ class CryptoHandler:
             logger.error(f"Error calculating crypto amount: {e}")
             return None
     
-    async def verify_eth_transaction(self, tx_hash, expected_amount, to_address):
-        """Verify Ethereum transaction (requires API key for full verification)"""
+    async def eth_rpc_batch(self, calls, rpc_url=None, deadline=None):
+        """Send several JSON-RPC calls in one request; returns results in call order"""
+        payload = [
+            {'jsonrpc': '2.0', 'id': index, 'method': method, 'params': params}
+            for index, (method, params) in enumerate(calls)
+        ]
+        
+        # Read-only calls, so safe to retry
+        response = await resilience.request(
+            'eth_rpc', 'POST', rpc_url or Config.ETH_RPC_URL,
+            deadline=deadline, idempotent=True, json=payload
+        )
+        if not response or response.status != 200:
+            logger.error(f"ETH RPC request failed: {response.status if response else 'unavailable'}")
+            return None
+        data = response.data
+        
+        if isinstance(data, dict):  # some nodes answer a failed batch with a single error object
+            logger.error(f"ETH RPC batch error: {data.get('error')}")
+            return None
+        
+        results = {item.get('id'): item.get('result') for item in data}
+        return [results.get(index) for index in range(len(calls))]
+    
+    @staticmethod
+    def parse_eth_transaction(tx, head):
+        """Get (recipient, amount in ETH, confirmations) from an eth_getTransactionByHash result"""
+        to = (tx.get('to') or '').lower()
+        value_eth = Decimal(int(tx.get('value', '0x0'), 16)) / 10**18
+        
+        confirmations = 0
+        if tx.get('blockNumber') and head is not None:
+            confirmations = max(0, head - int(tx['blockNumber'], 16) + 1)
+        
+        return to, value_eth, confirmations
+    
+    async def get_eth_transfer(self, tx_hash, deadline=None):
+        """Get (recipient, amount in ETH, confirmations) for an Ethereum transaction"""
         try:
-            # This is a basic implementation
-            # For production, you'd want to use services like Etherscan API
-            # or run your own Ethereum node
-            
-            api_key = "YourEtherscanAPIKey"  # You should get this from environment
-            url = f"https://api.etherscan.io/api?module=proxy&action=eth_getTransactionByHash&txhash={tx_hash}&apikey={api_key}"
+            results = await self.eth_rpc_batch([
+                ('eth_blockNumber', []),
+                ('eth_getTransactionByHash', [tx_hash])
+            ], deadline=deadline)
+            if not results or not results[1]:
+                return None
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        result = data.get('result')
-                        
-                        if result:
-                            # Verify transaction details
-                            to = result.get('to', '').lower()
-                            value_wei = int(result.get('value', '0'), 16)
-                            value_eth = value_wei / 10**18
-                            
-                            if to == to_address.lower() and abs(value_eth - expected_amount) < 0.001:
-                                return True
-                        
-                        return False
-                    return False
+            head = int(results[0], 16) if results[0] else None
+            return self.parse_eth_transaction(results[1], head)
         except Exception as e:
-            logger.error(f"Error verifying ETH transaction: {e}")
-            return False
+            logger.error(f"Error fetching ETH transaction: {e}")
+            return None
     
-    async def verify_ltc_transaction(self, tx_hash, expected_amount, to_address):
-        """Verify Litecoin transaction"""
+    async def get_ltc_transfer(self, tx_hash, to_address, deadline=None):
+        """Get (amount in LTC paid to an address, confirmations) for a Litecoin transaction"""
         try:
             # This is a basic implementation
             # For production, you'd want to use services like BlockCypher API
             # or run your own Litecoin node
             
-            url = f"https://api.blockcypher.com/v1/ltc/main/txs/{tx_hash}"
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        
-                        # Check outputs for our address
-                        outputs = data.get('outputs', [])
-                        for output in outputs:
-                            addresses = output.get('addresses', [])
-                            value_satoshi = output.get('value', 0)
-                            value_ltc = value_satoshi / 10**8
-                            
-                            if to_address in addresses and abs(value_ltc - expected_amount) < 0.001:
-                                return True
-                        
-                        return False
-                    return False
+            response = await resilience.request(
+                'blockcypher', 'GET', f"{Config.BLOCKCYPHER_API_BASE}/txs/{tx_hash}",
+                deadline=deadline, idempotent=True
+            )
+            if response and response.status == 200:
+                data = response.data
+                
+                # Sum the outputs paying our address
+                value_satoshi = sum(
+                    output.get('value', 0)
+                    for output in data.get('outputs', [])
+                    if to_address in (output.get('addresses') or [])
+                )
+                if value_satoshi:
+                    return Decimal(value_satoshi) / 10**8, data.get('confirmations', 0)
+            return None
         except Exception as e:
-            logger.error(f"Error verifying LTC transaction: {e}")
+            logger.error(f"Error fetching LTC transaction: {e}")
+            return None
+    
+    async def verify_eth_transaction(self, tx_hash, expected_amount, to_address, deadline=None):
+        """Verify Ethereum transaction against the order's quoted amount"""
+        transfer = await self.get_eth_transfer(tx_hash, deadline)
+        if not transfer:
+            return False
+        
+        to, value_eth, confirmations = transfer
+        return (
+            to == to_address.lower()
+            and confirmations >= Config.ETH_CONFIRMATIONS
+            and self.matcher.matches('eth', value_eth, expected_amount)
+        )
+    
+    async def verify_ltc_transaction(self, tx_hash, expected_amount, to_address, deadline=None):
+        """Verify Litecoin transaction against the order's quoted amount"""
+        transfer = await self.get_ltc_transfer(tx_hash, to_address, deadline)
+        if not transfer:
+            return False
+        
+        value_ltc, confirmations = transfer
+        return confirmations >= Config.LTC_CONFIRMATIONS and self.matcher.matches('ltc', value_ltc, expected_amount)
+    
+    async def verify_order_transaction(self, order, tx_hash, deadline=None):
+        """Verify a transaction against the quote locked on the order at checkout"""
+        if not order.get('crypto_amount'):
+            logger.warning(f"Order {order['id']} has no locked crypto quote")
             return False
+        
+        if order['payment_method'] == 'eth':
+            return await self.verify_eth_transaction(tx_hash, order['crypto_amount'], self.eth_address, deadline)
+        if order['payment_method'] == 'ltc':
+            return await self.verify_ltc_transaction(tx_hash, order['crypto_amount'], self.ltc_address, deadline)
+        return False
+    
+    async def reconcile_transaction(self, db, crypto_type, tx_hash, deadline=None):
+        """Match a confirmed transfer to our wallet against open quotes; returns the order ID or None"""
+        crypto_type = crypto_type.lower()
+        if crypto_type == 'eth':
+            transfer = await self.get_eth_transfer(tx_hash, deadline)
+            if not transfer or transfer[0] != (self.eth_address or '').lower():
+                return None
+            _, amount, confirmations = transfer
+            required = Config.ETH_CONFIRMATIONS
+        elif crypto_type == 'ltc':
+            transfer = await self.get_ltc_transfer(tx_hash, self.ltc_address, deadline)
+            if not transfer:
+                return None
+            amount, confirmations = transfer
+            required = Config.LTC_CONFIRMATIONS
+        else:
+            return None
+        
+        if confirmations < required:
+            logger.info(f"{crypto_type} transfer {tx_hash} has {confirmations}/{required} confirmations")
+            return None
+        
+        return await self.matcher.reconcile(db, crypto_type, amount, tx_hash)
     
     async def monitor_address(self, address, crypto_type, expected_amount):
         """Monitor address for incoming transactions"""
         # This would be used to automatically detect payments
         # For now, it's a placeholder for manual verification
         pass
+
+class CryptoProvider(PaymentProvider):
+    """ETH/LTC to the shop wallet, identified by a unique locked amount"""
+    
+    limited_steps = ('quote', 'verify')
+    
+    def __init__(self, bot, method, info):
+        super().__init__(bot, method, info)
+        self.handler = CryptoHandler(bot.payment_matcher)
+    
+    async def quote(self, order, deadline=None):
+        # Orders share one wallet, so each gets a unique amount
+        rate = await self.handler.get_price(self.method, deadline=deadline)
+        if not rate:
+            return None
+        
+        quoted = self.bot.payment_matcher.quote(order['id'], self.method, order['total'] / rate)
+        if not quoted:
+            return None
+        
+        # The locked quote is what verification checks against later
+        await self.bot.db.set_order_crypto_quote(order['id'], quoted, rate, Config.ORDER_EXPIRY_MINUTES)
+        return await self.bot.db.get_order(order['id'])
+    
+    async def verify(self, order, reference=None, deadline=None):
+        if not reference:
+            return False
+        return await self.handler.verify_order_transaction(order, reference, deadline)
+    
+    async def cancel(self, order, deadline=None):
+        await super().cancel(order, deadline)
+        self.bot.payment_matcher.release(order['id'])
+        return True
@@ -0,0 +1,109 @@
+import asyncio
+import heapq
+import time
+from bot.config import Config
+from bot.utils.logger import setup_logger
+
+logger = setup_logger()
+
+class OrderExpiryScheduler:
+    """Cancels unpaid orders once their payment window closes.
+    
+    Every pending order's deadline sits in one min-heap, so a single task
+    sleeps until the earliest deadline instead of scanning the orders table or
+    keeping a timer per order. Orders that get paid or cancelled in the
+    meantime stay in the heap; the conditional update skips them when their
+    deadline comes up.
+    """
+    
+    # Stay under SQLite's bound parameter limit
+    BATCH_SIZE = 500
+    # Delay before retrying a batch the database rejected
+    RETRY_SECONDS = 30
+    
+    def __init__(self, db, matcher, ttl=None):
+        self.db = db
+        self.matcher = matcher
+        self.ttl = ttl or Config.ORDER_EXPIRY_MINUTES * 60
+        self._heap = []  # (deadline, order_id)
+        self._wakeup = asyncio.Event()
+        self._task = None
+    
+    async def load(self):
+        """Rebuild the heap from the pending orders in the database"""
+        rows = await self.db.get_pending_order_times()
+        self._heap = [(created_at + self.ttl, order_id) for order_id, created_at in rows]
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+        logger.info(f"Scheduled expiry for {len(self._heap)} pending order(s)")
+    
+    def schedule(self, order_id, created_at=None):
+        """Add an order's deadline; wakes the task if it is now the earliest"""
+        deadline = (created_at or time.time()) + self.ttl
+        heapq.heappush(self._heap, (deadline, order_id))
+        if self._heap[0][1] == order_id:
+            self._wakeup.set()
+    
+    @property
+    def pending_count(self):
+        return len(self._heap)
+    
+    @property
+    def next_deadline(self):
+        return self._heap[0][0] if self._heap else None
+    
+    async def expire_due(self, now=None):
+        """Cancel every order whose deadline has passed; returns the cancelled IDs"""
+        now = now or time.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[1])
+        
+        expired = []
+        for start in range(0, len(due), self.BATCH_SIZE):
+            batch = due[start:start + self.BATCH_SIZE]
+            try:
+                expired.extend(await self.db.expire_orders(batch))
+            except Exception as e:
+                logger.error(f"Error expiring orders: {e}")
+                for order_id in batch:
+                    heapq.heappush(self._heap, (now + self.RETRY_SECONDS, order_id))
+        
+        for order_id in expired:
+            self.matcher.release(order_id)
+        if expired:
+            logger.info(f"Expired {len(expired)} unpaid order(s)")
+        return expired
+    
+    def start(self):
+        """Start the background expiry task"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the background expiry task"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                await self.expire_due()
+            except Exception as e:
+                logger.error(f"Order expiry error: {e}")
+            
+            # Sleep until the earliest deadline, or until schedule() brings one forward
+            delay = None
+            if self._heap:
+                delay = max(self.next_deadline - time.time(), 0)
+            
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,153 @@
+import bisect
+from decimal import Decimal, ROUND_HALF_UP
+from bot.config import Config
+from bot.utils.logger import setup_logger
+
+logger = setup_logger()
+
+class PaymentMatcher:
+    """Unique per-order crypto quotes with a sorted index for matching transfers.
+    
+    All orders on an asset share one wallet address, so the quoted amount is
+    the only thing that identifies an order. Each quote is a whole number of
+    steps (``Config.CRYPTO_QUOTE_DECIMALS``) and no two open quotes share a
+    step, so a tolerance of under half a step never overlaps two orders.
+    Amounts are kept as integers in the asset's base unit (wei, litoshi).
+    """
+    
+    # Base-unit decimals per asset
+    DECIMALS = {
+        'eth': 18,
+        'ltc': 8
+    }
+    
+    def __init__(self):
+        self._amounts = {asset: [] for asset in self.DECIMALS}   # sorted base units
+        self._orders = {asset: {} for asset in self.DECIMALS}    # base units -> order_id
+        self._quotes = {}                                         # order_id -> (asset, base units)
+    
+    def step(self, asset):
+        """Size of one dust step in base units"""
+        return 10 ** (self.DECIMALS[asset] - Config.CRYPTO_QUOTE_DECIMALS[asset])
+    
+    def tolerance(self, asset):
+        """Largest deviation (exclusive) accepted when matching a transfer"""
+        return self.step(asset) // 2
+    
+    def to_units(self, asset, amount):
+        """Convert a crypto amount to integer base units"""
+        units = Decimal(str(amount)) * (10 ** self.DECIMALS[asset])
+        return int(units.to_integral_value(rounding=ROUND_HALF_UP))
+    
+    def to_amount(self, asset, units):
+        """Convert integer base units back to a crypto amount"""
+        return Decimal(units) / (10 ** self.DECIMALS[asset])
+    
+    def format_amount(self, asset, units):
+        """Format base units with the quote's number of decimals"""
+        places = Config.CRYPTO_QUOTE_DECIMALS[asset]
+        return f"{self.to_amount(asset, units):.{places}f}"
+    
+    def quote(self, order_id, asset, amount):
+        """Reserve a unique amount for an order; returns it as a string, or None if no slot is free"""
+        asset = asset.lower()
+        if order_id in self._quotes:
+            return self.format_amount(*self._quotes[order_id])
+        
+        step = self.step(asset)
+        base = -(-self.to_units(asset, amount) // step)  # round up so the dust never underpays
+        taken = self._orders[asset]
+        
+        for offset in range(1, Config.CRYPTO_MAX_DUST_STEPS + 1):
+            units = (base + offset) * step
+            if units not in taken:
+                self._add(order_id, asset, units)
+                return self.format_amount(asset, units)
+        
+        logger.error(f"No free {asset} quote slot near {amount} for order {order_id}")
+        return None
+    
+    def restore(self, order_id, asset, amount):
+        """Re-register a quote that was persisted before a restart"""
+        asset = asset.lower()
+        units = self.to_units(asset, amount)
+        owner = self._orders[asset].get(units)
+        if owner and owner != order_id:
+            logger.warning(f"Duplicate {asset} quote {amount} for orders {owner} and {order_id}")
+            return False
+        if order_id not in self._quotes:
+            self._add(order_id, asset, units)
+        return True
+    
+    def release(self, order_id):
+        """Drop an order's quote once it is paid, cancelled or expired"""
+        quote = self._quotes.pop(order_id, None)
+        if not quote:
+            return
+        asset, units = quote
+        amounts = self._amounts[asset]
+        index = bisect.bisect_left(amounts, units)
+        if index < len(amounts) and amounts[index] == units:
+            del amounts[index]
+        self._orders[asset].pop(units, None)
+    
+    def candidates(self, asset, amount):
+        """Orders whose quote lies within the tolerance window of a received amount"""
+        asset = asset.lower()
+        units = self.to_units(asset, amount)
+        tolerance = self.tolerance(asset)
+        amounts = self._amounts[asset]
+        
+        low = bisect.bisect_right(amounts, units - tolerance)
+        high = bisect.bisect_left(amounts, units + tolerance)
+        return [self._orders[asset][value] for value in amounts[low:high]]
+    
+    def matches(self, asset, received, expected):
+        """Check a received amount against one order's quoted amount"""
+        asset = asset.lower()
+        return abs(self.to_units(asset, received) - self.to_units(asset, expected)) < self.tolerance(asset)
+    
+    async def reconcile(self, db, asset, amount, transaction_hash=None):
+        """Match an incoming transfer to an order, or queue it for admin review"""
+        asset = asset.lower()
+        
+        # Re-polls of a transfer that was already credited are no-ops
+        if transaction_hash:
+            credited = await db.get_transaction_order_id(transaction_hash)
+            if credited:
+                return credited
+        
+        orders = self.candidates(asset, amount)
+        
+        if len(orders) == 1:
+            order_id = orders[0]
+            if await db.mark_order_paid(order_id, transaction_hash):
+                self.release(order_id)
+                await db.record_payment_event(
+                    order_id, asset, f"{asset}:{transaction_hash}", float(amount),
+                    status='completed', transaction_hash=transaction_hash
+                )
+                logger.info(f"Matched {amount} {asset} transfer {transaction_hash} to order {order_id}")
+                return order_id
+            reason = 'order_closed'
+        elif orders:
+            reason = 'ambiguous'
+        else:
+            reason = 'unmatched'
+        
+        review_id = await db.add_payment_review(asset, str(amount), transaction_hash, reason, orders)
+        if review_id:
+            logger.warning(f"Queued {asset} transfer {transaction_hash} for review #{review_id}: {reason}")
+        return None
+    
+    async def load(self, db):
+        """Rebuild the index from open orders in the database"""
+        for order_id, asset, amount in await db.get_open_crypto_quotes():
+            if asset in self.DECIMALS:
+                self.restore(order_id, asset, amount)
+        logger.info(f"Loaded {len(self._quotes)} open crypto quote(s)")
+    
+    def _add(self, order_id, asset, units):
+        bisect.insort(self._amounts[asset], units)
+        self._orders[asset][units] = order_id
+        self._quotes[order_id] = (asset, units)
@@ -1,12 +1,17 @@
-import aiohttp
 import json
 import base64
+import time
 from urllib.parse import urljoin
 from bot.config import Config
+from bot.payments import resilience
+from bot.payments.registry import PaymentProvider
 from bot.utils.logger import setup_logger
 
 logger = setup_logger()
 
+# Seconds before expiry at which the access token is renewed
+TOKEN_REFRESH_MARGIN = 60
+
 class PayPalHandler:
     def __init__(self):
         self.client_id = Config.PAYPAL_CLIENT_ID
@@ -20,9 +25,13 @@ class PayPalHandler:
             self.base_url = "https://api.paypal.com"
             self.web_url = "https://www.paypal.com"
         
+        if Config.PAYPAL_API_BASE:
+            self.base_url = Config.PAYPAL_API_BASE.rstrip('/')
+        
         self.access_token = None
+        self.token_expires_at = 0  # monotonic time the access token expires
     
-    async def get_access_token(self):
+    async def get_access_token(self, deadline=None):
         """Get PayPal access token"""
         if not self.client_id or not self.client_secret:
             logger.error("PayPal credentials not configured")
@@ -40,36 +49,47 @@ class PayPalHandler:
             
             data = 'grant_type=client_credentials'
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/v1/oauth2/token",
-                    headers=headers,
-                    data=data
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        self.access_token = result.get('access_token')
-                        return self.access_token
-                    else:
-                        logger.error(f"PayPal auth failed: {response.status}")
-                        return None
+            response = await resilience.request(
+                'paypal', 'POST', f"{self.base_url}/v1/oauth2/token",
+                deadline=deadline, idempotent=True, headers=headers, data=data
+            )
+            if response and response.status == 200:
+                self.access_token = response.data.get('access_token')
+                self.token_expires_at = time.monotonic() + int(response.data.get('expires_in', 0))
+                return self.access_token
+            
+            logger.error(f"PayPal auth failed: {response.status if response else 'unavailable'}")
+            return None
         
         except Exception as e:
             logger.error(f"PayPal auth error: {e}")
             return None
     
-    async def create_payment(self, order):
-        """Create PayPal payment"""
-        try:
-            if not self.access_token:
-                await self.get_access_token()
-            
+    async def authorized_request(self, method, path, deadline=None, headers=None, **kwargs):
+        """Call the API with a bearer token, renewing it near expiry and once after a 401"""
+        for attempt in range(2):
+            if not self.access_token or time.monotonic() >= self.token_expires_at - TOKEN_REFRESH_MARGIN:
+                await self.get_access_token(deadline)
             if not self.access_token:
                 return None
             
+            response = await resilience.request(
+                'paypal', method, f"{self.base_url}{path}", deadline=deadline, idempotent=True,
+                headers={**(headers or {}), 'Authorization': f'Bearer {self.access_token}'}, **kwargs
+            )
+            if not response or response.status != 401 or attempt:
+                return response
+            
+            logger.warning("PayPal rejected the access token; renewing it")
+            self.access_token = None
+    
+    async def create_payment(self, order, deadline=None):
+        """Create PayPal payment; returns {'id', 'approval_url'}"""
+        try:
             headers = {
                 'Content-Type': 'application/json',
-                'Authorization': f'Bearer {self.access_token}'
+                # Makes retries safe: PayPal returns the original payment for a repeated request ID
+                'PayPal-Request-Id': f"create-{order['id']}"
             }
             
             payment_data = {
@@ -86,98 +106,139 @@ class PayPalHandler:
                     "custom": order['id']  # Store order ID for reference
                 }],
                 "redirect_urls": {
-                    "return_url": "https://example.com/payment/success",  # You should replace this
-                    "cancel_url": "https://example.com/payment/cancel"    # You should replace this
+                    "return_url": f"{Config.PUBLIC_URL}/paypal/return",
+                    "cancel_url": f"{Config.PUBLIC_URL}/paypal/cancel"
                 }
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/v1/payments/payment",
-                    headers=headers,
-                    json=payment_data
-                ) as response:
-                    if response.status == 201:
-                        result = await response.json()
-                        
-                        # Find approval URL
-                        for link in result.get('links', []):
-                            if link.get('rel') == 'approval_url':
-                                return link.get('href')
-                        
-                        logger.error("PayPal approval URL not found")
-                        return None
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"PayPal payment creation failed: {response.status} - {error_text}")
-                        return None
+            response = await self.authorized_request(
+                'POST', "/v1/payments/payment", deadline=deadline, headers=headers, json=payment_data
+            )
+            if not response:
+                return None
+            
+            if response.status in (200, 201):
+                # Find approval URL
+                for link in response.data.get('links', []):
+                    if link.get('rel') == 'approval_url':
+                        return {
+                            'id': response.data.get('id'),
+                            'approval_url': link.get('href')
+                        }
+                
+                logger.error("PayPal approval URL not found")
+                return None
+            else:
+                logger.error(f"PayPal payment creation failed: {response.status} - {response.data}")
+                return None
         
         except Exception as e:
             logger.error(f"PayPal payment creation error: {e}")
             return None
     
-    async def execute_payment(self, payment_id, payer_id):
+    async def execute_payment(self, payment_id, payer_id, deadline=None):
         """Execute PayPal payment after approval"""
         try:
-            if not self.access_token:
-                await self.get_access_token()
-            
-            if not self.access_token:
-                return False
-            
             headers = {
                 'Content-Type': 'application/json',
-                'Authorization': f'Bearer {self.access_token}'
+                'PayPal-Request-Id': f"execute-{payment_id}"
             }
             
             execute_data = {
                 "payer_id": payer_id
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/v1/payments/payment/{payment_id}/execute",
-                    headers=headers,
-                    json=execute_data
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result.get('state') == 'approved'
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"PayPal payment execution failed: {response.status} - {error_text}")
-                        return False
+            response = await self.authorized_request(
+                'POST', f"/v1/payments/payment/{payment_id}/execute",
+                deadline=deadline, headers=headers, json=execute_data
+            )
+            if not response:
+                return False
+            
+            if response.status == 200:
+                return response.data.get('state') == 'approved'
+            else:
+                logger.error(f"PayPal payment execution failed: {response.status} - {response.data}")
+                return False
         
         except Exception as e:
             logger.error(f"PayPal payment execution error: {e}")
             return False
     
-    async def verify_payment(self, payment_id):
+    async def verify_payment(self, payment_id, deadline=None):
         """Verify PayPal payment status"""
         try:
-            if not self.access_token:
-                await self.get_access_token()
+            response = await self.authorized_request(
+                'GET', f"/v1/payments/payment/{payment_id}",
+                deadline=deadline, headers={'Content-Type': 'application/json'}
+            )
+            if response and response.status == 200:
+                return response.data
             
-            if not self.access_token:
-                return None
-            
-            headers = {
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {self.access_token}'
+            logger.error(f"PayPal payment verification failed: {response.status if response else 'unavailable'}")
+            return None
+        
+        except Exception as e:
+            logger.error(f"PayPal payment verification error: {e}")
+            return None
+    
+    async def verify_webhook_signature(self, headers, event, deadline=None):
+        """Verify a webhook delivery with PayPal's verify-webhook-signature API"""
+        if not Config.PAYPAL_WEBHOOK_ID:
+            logger.error("PAYPAL_WEBHOOK_ID not configured; rejecting webhook")
+            return False
+        
+        try:
+            verify_data = {
+                "auth_algo": headers.get('PAYPAL-AUTH-ALGO'),
+                "cert_url": headers.get('PAYPAL-CERT-URL'),
+                "transmission_id": headers.get('PAYPAL-TRANSMISSION-ID'),
+                "transmission_sig": headers.get('PAYPAL-TRANSMISSION-SIG'),
+                "transmission_time": headers.get('PAYPAL-TRANSMISSION-TIME'),
+                "webhook_id": Config.PAYPAL_WEBHOOK_ID,
+                "webhook_event": event
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.base_url}/v1/payments/payment/{payment_id}",
-                    headers=headers
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result
-                    else:
-                        logger.error(f"PayPal payment verification failed: {response.status}")
-                        return None
+            response = await self.authorized_request(
+                'POST', "/v1/notifications/verify-webhook-signature",
+                deadline=deadline, headers={'Content-Type': 'application/json'}, json=verify_data
+            )
+            if response and response.status == 200:
+                return response.data.get('verification_status') == 'SUCCESS'
+            
+            logger.error(f"PayPal webhook verification failed: {response.status if response else 'unavailable'}")
+            return False
         
         except Exception as e:
-            logger.error(f"PayPal payment verification error: {e}")
+            logger.error(f"PayPal webhook verification error: {e}")
+            return False
+
+class PayPalProvider(PaymentProvider):
+    """Buyer approves the payment on PayPal; completion arrives by webhook"""
+    
+    redirect = True
+    
+    def __init__(self, bot, method, info):
+        super().__init__(bot, method, info)
+        self.handler = PayPalHandler()
+    
+    async def create(self, order, deadline=None):
+        payment = await self.handler.create_payment(order, deadline=deadline)
+        if not payment:
             return None
+        
+        # Links the PayPal payment ID to the order
+        await self.bot.db.record_payment_attempt(order['id'], 'paypal', order['total'], payment_id=payment['id'])
+        return payment['approval_url']
+    
+    async def verify(self, order, reference=None, deadline=None):
+        payment_id = reference
+        if not payment_id:
+            for payment in await self.bot.db.get_order_payments(order['id']):
+                if payment['payment_method'] == 'paypal' and payment['payment_id']:
+                    payment_id = payment['payment_id']
+        if not payment_id:
+            return False
+        
+        payment = await self.handler.verify_payment(payment_id, deadline=deadline)
+        return bool(payment) and payment.get('state') == 'approved'
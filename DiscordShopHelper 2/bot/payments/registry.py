@@ -0,0 +1,158 @@
+import asyncio
+import importlib
+import time
+from bot.config import Config
+from bot.payments import resilience
+from bot.utils.logger import setup_logger
+from bot.utils.metrics import PROVIDER_STEP_SECONDS
+
+logger = setup_logger()
+
+class PaymentProvider:
+    """Base class for a payment method; subclasses override the steps they need.
+    
+    Every step is async and takes the order dict:
+    quote   - prepare the amount to pay before instructions are shown; returns the order or None
+    create  - start a payment with the provider; returns a URL for the buyer or None
+    verify  - check whether the order has been paid
+    cancel  - cancel the order and free anything held for it
+    """
+    
+    # True if the buyer pays on a provider page reached through create()
+    redirect = False
+    # Steps that call out to the provider and so count against its limits
+    limited_steps = ('create', 'verify')
+    
+    def __init__(self, bot, method, info):
+        self.bot = bot
+        self.method = method
+        self.info = info
+    
+    async def quote(self, order, deadline=None):
+        return order
+    
+    async def create(self, order, deadline=None):
+        return None
+    
+    async def verify(self, order, reference=None, deadline=None):
+        return False
+    
+    async def cancel(self, order, deadline=None):
+        await self.bot.db.update_order_status(order['id'], 'cancelled')
+        return True
+
+class ProviderLimiter:
+    """Concurrency cap plus token-bucket rate limit for one provider"""
+    
+    def __init__(self, max_concurrency=None, rate_limit=None):
+        self.semaphore = asyncio.Semaphore(max_concurrency or 10)
+        self.rate_limit = rate_limit or 0  # calls per second, 0 = unlimited
+        # Holds at least one whole token, so rates below 1/s still let calls through
+        self.capacity = max(1.0, self.rate_limit)
+        self._tokens = self.capacity
+        self._refilled = time.monotonic()
+    
+    def _take_token(self):
+        """Take a token if one is available; otherwise return seconds until the next one"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._refilled) * self.rate_limit)
+        self._refilled = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self.rate_limit
+    
+    async def acquire(self, deadline=None):
+        """Wait for a slot and a token; raises asyncio.TimeoutError past the deadline"""
+        timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+        await asyncio.wait_for(self.semaphore.acquire(), timeout=timeout)
+        
+        if not self.rate_limit:
+            return
+        
+        while True:
+            wait = self._take_token()
+            if not wait:
+                return
+            if deadline is not None and time.monotonic() + wait >= deadline:
+                self.semaphore.release()
+                raise asyncio.TimeoutError()
+            await asyncio.sleep(wait)
+    
+    def release(self):
+        self.semaphore.release()
+
+class PaymentRegistry:
+    """Payment methods from Config.PAYMENT_METHODS, with providers imported on first use.
+    
+    Each method's ``handler`` names its PaymentProvider class as
+    ``module:Class``. Calls go through the method's own ProviderLimiter, so a
+    burst on one provider never holds up checkouts on another.
+    """
+    
+    def __init__(self, bot, methods=None):
+        self.bot = bot
+        self.methods = methods if methods is not None else Config.PAYMENT_METHODS
+        self._providers = {}
+        self._limiters = {}
+    
+    def is_available(self, method):
+        """Enabled, and no upstream service behind it has an open circuit"""
+        info = self.methods.get(method)
+        if not info or not info['enabled']:
+            return False
+        return all(resilience.is_available(provider) for provider in info['providers'])
+    
+    def available_methods(self):
+        """(method, info) for every method a buyer can pick right now"""
+        return [(method, info) for method, info in self.methods.items() if self.is_available(method)]
+    
+    def get(self, method):
+        """The provider for a method, importing it on first use"""
+        if method not in self._providers:
+            info = self.methods[method]
+            module_name, class_name = info['handler'].split(':')
+            provider_class = getattr(importlib.import_module(module_name), class_name)
+            self._providers[method] = provider_class(self.bot, method, info)
+            self._limiters[method] = ProviderLimiter(info.get('max_concurrency'), info.get('rate_limit'))
+            logger.info(f"Loaded payment provider {method} ({info['handler']})")
+        return self._providers[method]
+    
+    async def _call(self, method, step, order, *args, deadline=None):
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            result = await self._call_limited(method, step, order, *args, deadline=deadline)
+            outcome = 'ok'
+            return result
+        finally:
+            PROVIDER_STEP_SECONDS.observe(time.perf_counter() - started, method=method, step=step, outcome=outcome)
+    
+    async def _call_limited(self, method, step, order, *args, deadline=None):
+        provider = self.get(method)
+        if step not in provider.limited_steps:
+            return await getattr(provider, step)(order, *args, deadline=deadline)
+        
+        limiter = self._limiters[method]
+        try:
+            await limiter.acquire(deadline)
+        except asyncio.TimeoutError:
+            logger.warning(f"{method} {step} for order {order['id']} timed out waiting for a provider slot")
+            return None
+        
+        try:
+            return await getattr(provider, step)(order, *args, deadline=deadline)
+        finally:
+            limiter.release()
+    
+    async def quote(self, method, order, deadline=None):
+        return await self._call(method, 'quote', order, deadline=deadline)
+    
+    async def create(self, method, order, deadline=None):
+        return await self._call(method, 'create', order, deadline=deadline)
+    
+    async def verify(self, method, order, reference=None, deadline=None):
+        return await self._call(method, 'verify', order, reference, deadline=deadline)
+    
+    async def cancel(self, method, order, deadline=None):
+        return await self._call(method, 'cancel', order, deadline=deadline)
@@ -0,0 +1,184 @@
+import aiohttp
+import asyncio
+import random
+import time
+from bot.config import Config
+from bot.utils.logger import setup_logger
+from bot.utils.metrics import PROVIDER_REQUEST_SECONDS
+
+logger = setup_logger()
+
+# Discord invalidates an interaction if it is not answered within 3 seconds;
+# once answered, the token stays usable for 15 minutes
+INITIAL_RESPONSE_WINDOW = 3.0
+INTERACTION_TOKEN_LIFETIME = 15 * 60
+# Time kept back to actually send the reply after the provider call
+RESPONSE_MARGIN = 0.5
+
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+class ProviderResponse:
+    """Status and decoded body of a provider call"""
+    
+    def __init__(self, status, data):
+        self.status = status
+        self.data = data
+
+class CircuitBreaker:
+    """Fails fast after repeated provider failures, then lets a probe through"""
+    
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or Config.PROVIDER_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or Config.PROVIDER_RESET_SECONDS
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+    
+    @property
+    def is_open(self):
+        """True while calls are being refused"""
+        if self.opened_at is None:
+            return False
+        return time.monotonic() - self.opened_at < self.reset_timeout or self._probing
+    
+    def allow(self):
+        """Whether a call may go out now; admits a single probe once the reset timeout passes"""
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at < self.reset_timeout or self._probing:
+            return False
+        self._probing = True
+        return True
+    
+    def release_probe(self):
+        """Let another probe through when one ended without a result"""
+        self._probing = False
+    
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info(f"Circuit for {self.name} closed")
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+    
+    def record_failure(self):
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            if not self._probing:
+                logger.warning(f"Circuit for {self.name} opened after {self.failures} failures")
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+_breakers = {}
+_session = None
+
+def get_breaker(provider):
+    """Circuit breaker shared by every call to a provider"""
+    if provider not in _breakers:
+        _breakers[provider] = CircuitBreaker(provider)
+    return _breakers[provider]
+
+def is_available(provider):
+    """False while the provider's circuit is open"""
+    return not get_breaker(provider).is_open
+
+def interaction_deadline(interaction):
+    """Monotonic deadline for provider calls made while handling an interaction"""
+    window = INTERACTION_TOKEN_LIFETIME if interaction.response.is_done() else INITIAL_RESPONSE_WINDOW
+    elapsed = time.time() - interaction.created_at.timestamp()
+    return time.monotonic() + window - elapsed - RESPONSE_MARGIN
+
+async def get_session():
+    """Shared HTTP session for provider calls"""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession()
+    return _session
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+async def request(provider, method, url, deadline=None, idempotent=False, **kwargs):
+    """Call a payment provider with a deadline, bounded retries and a circuit breaker.
+    
+    Returns a ProviderResponse, or None if the circuit is open, the deadline
+    ran out or every attempt failed. Only idempotent calls are retried.
+    """
+    breaker = get_breaker(provider)
+    attempts = 1 + (Config.PROVIDER_MAX_RETRIES if idempotent else 0)
+    
+    for attempt in range(attempts):
+        timeout = Config.PROVIDER_TIMEOUT
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.monotonic())
+        if timeout <= 0:
+            logger.warning(f"{provider} call {method} {url} skipped: deadline passed")
+            return None
+        
+        if not breaker.allow():
+            logger.warning(f"{provider} circuit open; skipping {method} {url}")
+            return None
+        # Admitted while the circuit is open means this call is the probe
+        probe = breaker.opened_at is not None
+        
+        retryable = False
+        recorded = False
+        started = time.perf_counter()
+        try:
+            session = await get_session()
+            async with session.request(
+                method, url, timeout=aiohttp.ClientTimeout(total=timeout), **kwargs
+            ) as response:
+                if response.content_type == 'application/json':
+                    data = await response.json()
+                else:
+                    data = await response.text()
+            PROVIDER_REQUEST_SECONDS.observe(time.perf_counter() - started, provider=provider, status=response.status)
+            
+            recorded = True
+            # Throttling counts against the provider as much as server errors do
+            if response.status >= 500 or response.status == 429:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            
+            if response.status not in RETRYABLE_STATUSES:
+                return ProviderResponse(response.status, data)
+            retryable = True
+            result = ProviderResponse(response.status, data)
+        
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            PROVIDER_REQUEST_SECONDS.observe(time.perf_counter() - started, provider=provider, status='error')
+            recorded = True
+            breaker.record_failure()
+            logger.warning(f"{provider} call {method} {url} failed: {e!r}")
+            retryable = True
+            result = None
+        
+        except Exception as e:
+            # Unexpected errors, such as an undecodable body, still count against the provider
+            PROVIDER_REQUEST_SECONDS.observe(time.perf_counter() - started, provider=provider, status='error')
+            recorded = True
+            breaker.record_failure()
+            logger.error(f"{provider} call {method} {url} raised {e!r}")
+            raise
+        
+        finally:
+            # A cancelled or otherwise unrecorded probe must not hold the circuit open
+            if probe and not recorded:
+                breaker.release_probe()
+        
+        if not retryable or attempt == attempts - 1:
+            return result
+        
+        # Full jitter backoff, never sleeping past the deadline
+        delay = random.uniform(0, Config.PROVIDER_BACKOFF_BASE * (2 ** attempt))
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return result
+        await asyncio.sleep(delay)
+    
+    return None
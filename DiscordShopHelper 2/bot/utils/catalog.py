@@ -0,0 +1,52 @@
+import discord
+from bot.config import Config
+from bot.utils.embeds import EmbedBuilder
+from bot.utils.logger import setup_logger
+
+logger = setup_logger()
+
+class CatalogCache:
+    """Rendered catalog pages keyed by (category, page cursor), valid for one catalog version.
+    
+    The database bumps ``catalog_version`` on every product write; the first
+    request after that re-renders, every other one is a dictionary lookup.
+    Pages hold the serialized embed and the (fully dynamic) component layout,
+    built by ``view_factory(category, page_data, page)``.
+    """
+    
+    def __init__(self, db, view_factory):
+        self.db = db
+        self.view_factory = view_factory
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._pages = {}
+    
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+    
+    async def render(self, category=None, before_id=0, page=1):
+        """Get (embed, view) for the catalog page that starts below product ``before_id``"""
+        version = self.db.catalog_version
+        if version != self.version:
+            self._pages.clear()
+            self.version = version
+        
+        key = (category, before_id, page)
+        cached = self._pages.get(key)
+        if cached:
+            self.hits += 1
+        else:
+            self.misses += 1
+            data = await self.db.get_product_page(category, before_id, Config.CATALOG_PAGE_SIZE)
+            embed = EmbedBuilder.product_catalog(data['products'], category, page, data['total'])
+            cached = (embed.to_dict(), self.view_factory(category, data, page))
+            
+            # Don't keep a page rendered from data that changed mid-fetch
+            if self.db.catalog_version == version:
+                self._pages[key] = cached
+        
+        payload, view = cached
+        return discord.Embed.from_dict(payload), view
@@ -0,0 +1,85 @@
+import asyncio
+import time
+from bot.config import Config
+from bot.utils.logger import setup_logger
+
+logger = setup_logger()
+
+class DashboardSnapshot:
+    """The /admin figures, kept in memory and refreshed in the background.
+    
+    A refresh is one aggregated query. It runs every ``max_age`` seconds (the
+    "last N days" window moves with time) and, at most every ``min_interval``
+    seconds, after the database reports order or product writes, so bursts of
+    writes coalesce into one refresh. Admins always read the last snapshot.
+    """
+    
+    def __init__(self, db, max_age=None, min_interval=None):
+        self.db = db
+        self.max_age = max_age or Config.DASHBOARD_REFRESH_SECONDS
+        self.min_interval = min_interval or Config.DASHBOARD_MIN_REFRESH_SECONDS
+        self.data = None
+        self.as_of = None  # Unix time the data was read
+        self.refreshes = 0
+        self._versions = None
+        self._refreshed = 0  # monotonic time of the last refresh
+        self._lock = asyncio.Lock()
+        self._task = None
+    
+    def _db_versions(self):
+        return (self.db.orders_version, self.db.catalog_version)
+    
+    @property
+    def stale(self):
+        return (
+            self.data is None
+            or self._db_versions() != self._versions
+            or time.monotonic() - self._refreshed >= self.max_age
+        )
+    
+    async def refresh(self):
+        """Re-read the figures; concurrent callers share one query"""
+        started = self.refreshes
+        async with self._lock:
+            if self.refreshes != started and self.data is not None:
+                return self.data
+            
+            versions = self._db_versions()
+            self.data = await self.db.get_dashboard_stats(
+                days=7, low_stock_threshold=Config.LOW_STOCK_THRESHOLD
+            )
+            self._versions = versions
+            self._refreshed = time.monotonic()
+            self.as_of = time.time()
+            self.refreshes += 1
+            return self.data
+    
+    async def get(self):
+        """The current snapshot, read once if there is none yet"""
+        if self.data is None:
+            await self.refresh()
+        return self.data
+    
+    def start(self):
+        """Start the background refresh task"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the background refresh task"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self):
+        while True:
+            if self.stale:
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    logger.error(f"Dashboard refresh error: {e}")
+            await asyncio.sleep(self.min_interval)
@@ -1,5 +1,5 @@
 import discord
-from datetime import datetime
+from datetime import datetime, timezone
 from bot.config import Config
 
 class EmbedBuilder:
@@ -44,7 +44,7 @@ class EmbedBuilder:
         return embed
     
     @staticmethod
-    def product_catalog(products, category=None):
+    def product_catalog(products, category=None, page=1, total=None):
         title = f"🛍️ Shop - {category.title()}" if category else "🛍️ Product Catalog"
         embed = discord.Embed(
             title=title,
@@ -56,19 +56,64 @@ class EmbedBuilder:
             embed.description = "No products available in this category."
             return embed
         
-        for product in products[:10]:  # Limit to 10 products per embed
-            stock_text = f"Stock: {product['stock']}" if product['stock'] > 0 else "❌ Out of Stock"
+        for product in products[:Config.CATALOG_PAGE_SIZE]:
+            stock_text = f"Stock: {product['stock']}" if product['stock'] > 0 else "❌ Out of Stock (select it to get notified)"
             embed.add_field(
                 name=f"{product['name']} - ${product['price']:.2f}",
                 value=f"{product['description']}\n{stock_text}",
                 inline=True
             )
         
-        if len(products) > 10:
-            embed.set_footer(text=f"Showing 10 of {len(products)} products")
+        total = total or len(products)
+        pages = -(-total // Config.CATALOG_PAGE_SIZE)
+        embed.set_footer(text=f"Page {page} of {pages} - {total} products - pick one below for details")
         
         return embed
     
+    @staticmethod
+    def product_detail(product):
+        embed = discord.Embed(
+            title=f"{product['name']} - ${product['price']:.2f}",
+            description=product['description'],
+            color=Config.EMBED_COLOR,
+            timestamp=datetime.utcnow()
+        )
+        
+        category_info = Config.CATEGORIES.get(product['category'])
+        category = f"{category_info['emoji']} {category_info['name']}" if category_info else product['category']
+        embed.add_field(name="Category", value=category, inline=True)
+        embed.add_field(
+            name="Stock",
+            value=str(product['stock']) if product['stock'] > 0 else "❌ Out of Stock",
+            inline=True
+        )
+        embed.add_field(name="Product ID", value=f"`{product['id']}`", inline=True)
+        
+        if product.get('image_url'):
+            embed.set_image(url=product['image_url'])
+        
+        return embed
+    
+    @staticmethod
+    def purchase_confirmation(product, quantity):
+        embed = discord.Embed(
+            title="🛒 Purchase Confirmation",
+            color=Config.EMBED_COLOR
+        )
+        embed.add_field(name="Product", value=product['name'], inline=True)
+        embed.add_field(name="Quantity", value=str(quantity), inline=True)
+        embed.add_field(name="Unit Price", value=f"${product['price']:.2f}", inline=True)
+        embed.add_field(name="Total", value=f"${product['price'] * quantity:.2f}", inline=True)
+        embed.set_footer(text="Choose your payment method below")
+        return embed
+    
+    @staticmethod
+    def unix_time(value):
+        """Unix time of a SQLite CURRENT_TIMESTAMP value (UTC text) or a number"""
+        if isinstance(value, str):
+            return int(datetime.strptime(value, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc).timestamp())
+        return int(value)
+    
     @staticmethod
     def order_confirmation(order):
         embed = discord.Embed(
@@ -82,7 +127,7 @@ class EmbedBuilder:
         embed.add_field(name="Total", value=f"${order['total']:.2f}", inline=True)
         embed.add_field(name="Payment Method", value=order['payment_method'].title(), inline=True)
         embed.add_field(name="Status", value=order['status'].title(), inline=True)
-        embed.add_field(name="Created", value=f"<t:{int(order['created_at'])}:R>", inline=True)
+        embed.add_field(name="Created", value=f"<t:{EmbedBuilder.unix_time(order['created_at'])}:R>", inline=True)
         
         if order['status'] == 'pending':
             embed.description = "⏳ Your order is pending payment. Please complete the payment to proceed."
@@ -95,6 +140,17 @@ class EmbedBuilder:
         
         return embed
     
+    @staticmethod
+    def crypto_quote(order, symbol):
+        """Quoted amount with the locked rate and how long it holds"""
+        text = f"`{order['crypto_amount']}`"
+        if order.get('quote_rate'):
+            text += f"\n1 {symbol} = ${order['quote_rate']:,.2f}"
+        if order.get('quote_expires_at'):
+            expires = datetime.strptime(order['quote_expires_at'], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+            text += f"\nLocked until <t:{int(expires.timestamp())}:t>"
+        return text
+    
     @staticmethod
     def payment_instructions(order, payment_method):
         embed = discord.Embed(
@@ -109,19 +165,31 @@ class EmbedBuilder:
         if payment_method == 'paypal':
             embed.description = "Click the button below to pay with PayPal"
         elif payment_method == 'eth':
+            if order.get('crypto_amount'):
+                embed.add_field(
+                    name="Amount (ETH)",
+                    value=EmbedBuilder.crypto_quote(order, 'ETH'),
+                    inline=False
+                )
             embed.add_field(
                 name="Ethereum Address",
                 value=f"`{Config.ETH_WALLET_ADDRESS}`",
                 inline=False
             )
-            embed.description = "Send the exact amount to the address above"
+            embed.description = "Send the exact ETH amount to the address above - it identifies your order"
         elif payment_method == 'ltc':
+            if order.get('crypto_amount'):
+                embed.add_field(
+                    name="Amount (LTC)",
+                    value=EmbedBuilder.crypto_quote(order, 'LTC'),
+                    inline=False
+                )
             embed.add_field(
                 name="Litecoin Address", 
                 value=f"`{Config.LTC_WALLET_ADDRESS}`",
                 inline=False
             )
-            embed.description = "Send the exact amount to the address above"
+            embed.description = "Send the exact LTC amount to the address above - it identifies your order"
         elif payment_method == 'cashapp':
             embed.add_field(
                 name="CashApp Tag",
@@ -130,5 +198,15 @@ class EmbedBuilder:
             )
             embed.description = f"Send ${order['total']:.2f} to {Config.CASHAPP_USERNAME} with memo: {order['id']}"
         
-        embed.set_footer(text="Payment must be completed within 30 minutes")
+        embed.set_footer(text=f"Payment must be completed within {Config.ORDER_EXPIRY_MINUTES} minutes")
+        return embed
+    
+    @staticmethod
+    def back_in_stock(product_id, name, stock):
+        embed = discord.Embed(
+            title="🔔 Back in Stock",
+            description=f"**{name}** is available again ({stock} in stock).\nUse `/buy product_id:{product_id}` before it sells out!",
+            color=Config.SUCCESS_COLOR,
+            timestamp=datetime.utcnow()
+        )
         return embed
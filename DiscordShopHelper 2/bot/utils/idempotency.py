@@ -0,0 +1,64 @@
+import asyncio
+import time
+from collections import OrderedDict
+from bot.config import Config
+from bot.utils.logger import setup_logger
+
+logger = setup_logger()
+
+def interaction_key(interaction, action=None):
+    """(user, message, action) for a component click; action defaults to the custom_id"""
+    message_id = interaction.message.id if interaction.message else None
+    return interaction.user.id, message_id, action or (interaction.data or {}).get('custom_id')
+
+class InteractionDeduplicator:
+    """Runs an action once per key, however many times the button is clicked.
+    
+    Clicks that arrive while the first is still running wait for its result;
+    clicks shortly after get the cached result. Failures are not cached, so
+    the user can retry. Results live for ``ttl`` seconds and at most
+    ``max_entries`` are kept, oldest dropped first.
+    """
+    
+    def __init__(self, ttl=None, max_entries=None):
+        self.ttl = ttl or Config.INTERACTION_DEDUP_SECONDS
+        self.max_entries = max_entries or Config.INTERACTION_DEDUP_MAX
+        self.duplicates = 0
+        self._inflight = {}
+        self._results = OrderedDict()  # key -> (expires, result), oldest first
+    
+    def _evict(self, now):
+        while self._results:
+            key, (expires, _) = next(iter(self._results.items()))
+            if expires > now and len(self._results) <= self.max_entries:
+                break
+            self._results.popitem(last=False)
+    
+    async def run(self, key, action):
+        """Await ``action()`` unless this key already ran; returns the (shared) result"""
+        now = time.monotonic()
+        self._evict(now)
+        
+        if key in self._results:
+            self.duplicates += 1
+            return self._results[key][1]
+        
+        if key in self._inflight:
+            self.duplicates += 1
+            return await asyncio.shield(self._inflight[key])
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await action()
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            del self._inflight[key]
+        
+        future.set_result(result)
+        self._results[key] = (time.monotonic() + self.ttl, result)
+        self._evict(time.monotonic())
+        return result
@@ -1,33 +1,117 @@
+import atexit
+import contextvars
+import gzip
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import shutil
 import sys
-from datetime import datetime
+from datetime import datetime, timezone
+from bot.config import Config
+
+# Fields added to every record logged from the current task (interaction id, order id, ...)
+_context = contextvars.ContextVar('log_context', default={})
+_listener = None
+
+def bind(**fields):
+    """Attach fields to every later log record from the current task"""
+    _context.set({**_context.get(), **fields})
+
+def bind_interaction(interaction):
+    """Attach an interaction's ids; call at the start of its handler"""
+    data = interaction.data or {}
+    bind(
+        interaction_id=interaction.id,
+        user_id=interaction.user.id if interaction.user else None,
+        guild_id=interaction.guild_id,
+        action=interaction.command.qualified_name if interaction.command else data.get('custom_id')
+    )
+
+class ContextFilter(logging.Filter):
+    """Copies the bound fields onto the record before it leaves the calling task"""
+    
+    def filter(self, record):
+        record.context = _context.get()
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+    
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update(getattr(record, 'context', {}))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def _gzip_namer(name):
+    return name + '.gz'
+
+def _gzip_rotator(source, dest):
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
 
 def setup_logger():
-    """Setup logging configuration"""
+    """Get the bot logger, configuring logging on the first call.
+    
+    Records are put on a queue and written by a QueueListener thread, so
+    logging from the event loop never waits on the console or disk. The log
+    file holds JSON lines and is rotated by size, with old files gzipped.
+    """
+    global _listener
     logger = logging.getLogger('shop_bot')
-    logger.setLevel(logging.INFO)
+    if _listener is not None:
+        return logger
     
-    # Remove existing handlers
+    logger.setLevel(Config.LOG_LEVEL)
     for handler in logger.handlers[:]:
         logger.removeHandler(handler)
     
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
-    
-    # File handler
-    file_handler = logging.FileHandler('bot.log', encoding='utf-8')
-    file_handler.setLevel(logging.DEBUG)
-    
-    # Formatter
-    formatter = logging.Formatter(
+    console_handler.setFormatter(logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    ))
+    
+    # File handler, rotated and compressed
+    file_handler = logging.handlers.RotatingFileHandler(
+        Config.LOG_FILE,
+        maxBytes=Config.LOG_MAX_BYTES,
+        backupCount=Config.LOG_BACKUP_COUNT,
+        encoding='utf-8'
     )
+    file_handler.namer = _gzip_namer
+    file_handler.rotator = _gzip_rotator
+    file_handler.setLevel(logging.DEBUG)
+    file_handler.setFormatter(JsonFormatter())
     
-    console_handler.setFormatter(formatter)
-    file_handler.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    logger.addHandler(queue_handler)
+    # asyncio's warnings (slow callbacks in debug mode, exceptions never retrieved)
+    logging.getLogger('asyncio').addHandler(queue_handler)
     
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    _listener = logging.handlers.QueueListener(
+        log_queue, console_handler, file_handler, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(shutdown_logging)
     
     return logger
+
+def shutdown_logging():
+    """Write out queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
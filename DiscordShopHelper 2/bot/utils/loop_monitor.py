@@ -0,0 +1,157 @@
+import asyncio
+import math
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from bot.config import Config
+from bot.utils.logger import setup_logger
+from bot.utils.metrics import LOOP_LAG_SECONDS, LOOP_STALLS
+
+logger = setup_logger()
+
+class LoopMonitor:
+    """Measures event-loop lag and reports whatever is blocking the loop.
+    
+    A task on the loop sleeps ``interval`` seconds at a time; how late it
+    wakes up is the loop's scheduling lag, recorded in a histogram. A watchdog
+    thread checks that the task keeps waking up, and when the loop has been
+    blocked for ``threshold`` seconds it logs the loop thread's stack, which
+    points at the blocking call while it is still running.
+    
+    ``asyncio_debug`` also turns on asyncio's own slow-callback warnings
+    (``loop.slow_callback_duration``). Debug mode slows every callback a
+    little, so it is for tracking a problem down, not for leaving on.
+    """
+    
+    # Lag samples kept for /loop_monitor percentiles, about a minute at the default interval
+    RECENT_SAMPLES = 600
+    
+    def __init__(self, interval=None, threshold=None):
+        self.interval = interval or Config.LOOP_MONITOR_INTERVAL
+        self.threshold = threshold or Config.LOOP_LAG_WARN_MS / 1000
+        self.asyncio_debug = False
+        self.stalls = 0
+        self.max_lag = 0.0
+        self.recent = deque(maxlen=self.RECENT_SAMPLES)
+        self.started_at = None
+        self._beat = None  # monotonic time the loop task last woke up
+        self._reported_beat = None
+        self._loop = None
+        self._loop_thread = None
+        self._saved_debug = None
+        self._task = None
+        self._watchdog = None
+        self._stopping = threading.Event()
+    
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+    
+    def start(self, asyncio_debug=None):
+        """Start measuring; must be called from the event loop's thread.
+        
+        ``asyncio_debug`` left as None keeps the current debug setting.
+        """
+        if self.running:
+            if asyncio_debug is not None:
+                self.set_asyncio_debug(asyncio_debug)
+            return
+        
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._reported_beat = None
+        self.started_at = time.time()
+        self.max_lag = 0.0
+        self.recent.clear()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run())
+        self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._watchdog.start()
+        if asyncio_debug is not None:
+            self.set_asyncio_debug(asyncio_debug)
+        logger.info(f"Loop monitor started (interval {self.interval * 1000:.0f} ms, threshold {self.threshold * 1000:.0f} ms)")
+    
+    async def stop(self):
+        """Stop the lag task and the watchdog thread"""
+        self.set_asyncio_debug(False)
+        self._stopping.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog:
+            await asyncio.to_thread(self._watchdog.join, self.interval * 2)
+            self._watchdog = None
+    
+    def set_asyncio_debug(self, enabled):
+        """Turn asyncio's slow-callback warnings on or off"""
+        loop = self._loop
+        if loop is None or enabled == self.asyncio_debug:
+            return
+        if enabled:
+            self._saved_debug = (loop.get_debug(), loop.slow_callback_duration)
+            loop.slow_callback_duration = self.threshold
+            loop.set_debug(True)
+        else:
+            debug, duration = self._saved_debug
+            loop.set_debug(debug)
+            loop.slow_callback_duration = duration
+        self.asyncio_debug = enabled
+    
+    async def _run(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            lag = max(now - expected, 0.0)
+            
+            LOOP_LAG_SECONDS.observe(lag)
+            self.recent.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.threshold:
+                self.stalls += 1
+                LOOP_STALLS.inc()
+                logger.warning(f"Event loop was blocked for {lag * 1000:.0f} ms")
+    
+    def _watch(self):
+        # Runs in its own thread, so it keeps going while the loop is blocked
+        while not self._stopping.wait(self.interval):
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked < self.threshold or beat == self._reported_beat:
+                continue
+            
+            self._reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = ''.join(traceback.format_stack(frame)) if frame else 'unavailable\n'
+            logger.warning(
+                f"Event loop blocked for over {blocked * 1000:.0f} ms; loop thread is at:\n{stack.rstrip()}"
+            )
+    
+    def percentile(self, fraction):
+        """Lag percentile over the recent samples, in seconds"""
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(math.ceil(fraction * len(ordered)) - 1, len(ordered) - 1)]
+    
+    def snapshot(self):
+        """Status for /loop_monitor and /health"""
+        p50 = self.percentile(0.5)
+        p99 = self.percentile(0.99)
+        return {
+            'running': self.running,
+            'asyncio_debug': self.asyncio_debug,
+            'threshold_ms': self.threshold * 1000,
+            'p50_ms': None if p50 is None else p50 * 1000,
+            'p99_ms': None if p99 is None else p99 * 1000,
+            'max_ms': self.max_lag * 1000,
+            'stalls': self.stalls
+        }
@@ -0,0 +1,202 @@
+import functools
+import inspect
+import math
+import time
+
+# Seconds; covers a cached catalog render up to a slow provider call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+def _number(value):
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """A named metric with a fixed set of label names"""
+    
+    kind = 'untyped'
+    
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+    
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labels)
+    
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(Metric):
+    """Monotonic count per label set"""
+    
+    kind = 'counter'
+    
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self._values = {}
+    
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+    
+    def render(self):
+        return self.header() + [
+            f"{self.name}{_label_text(self.labels, key)} {_number(value)}"
+            for key, value in self._values.items()
+        ]
+
+class Gauge(Metric):
+    """Current value per label set, set directly or read from a callback at scrape time"""
+    
+    kind = 'gauge'
+    
+    def __init__(self, name, documentation, labels=(), callback=None):
+        super().__init__(name, documentation, labels)
+        self.callback = callback  # returns a number, or {label tuple: number} when labelled
+        self._values = {}
+    
+    def set(self, value, **labels):
+        self._values[self._key(labels)] = value
+    
+    def render(self):
+        values = self._values
+        if self.callback:
+            try:
+                result = self.callback()
+            except Exception:
+                return []
+            values = result if isinstance(result, dict) else {(): result}
+        return self.header() + [
+            f"{self.name}{_label_text(self.labels, key)} {_number(value)}"
+            for key, value in values.items() if value is not None
+        ]
+
+class Histogram(Metric):
+    """Fixed-bucket histogram per label set; quantiles come from the buckets"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label tuple -> [bucket counts..., sum, count]
+    
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+                break
+        series[-2] += value
+        series[-1] += 1
+    
+    def time(self, **labels):
+        """Context manager observing the seconds spent in its block"""
+        return _Timer(self, labels)
+    
+    def render(self):
+        lines = self.header()
+        bucket_labels = self.labels + ('le',)
+        for key, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_label_text(bucket_labels, key + (_number(bound),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_label_text(bucket_labels, key + ('+Inf',))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {series[-1]}")
+        return lines
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+class MetricsRegistry:
+    """Metrics by name; registering an existing name returns the existing metric"""
+    
+    def __init__(self):
+        self._metrics = {}
+    
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            return self._metrics[metric.name]
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter(name, documentation, labels))
+    
+    def gauge(self, name, documentation, labels=(), callback=None):
+        return self._register(Gauge(name, documentation, labels, callback))
+    
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labels, buckets))
+    
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+COMMAND_SECONDS = registry.histogram(
+    'shopbot_command_seconds', 'Slash command handling time', ('command', 'status')
+)
+DB_SECONDS = registry.histogram(
+    'shopbot_db_seconds', 'DatabaseManager method time', ('method',)
+)
+PROVIDER_STEP_SECONDS = registry.histogram(
+    'shopbot_provider_step_seconds', 'Payment provider step time, including waiting for a slot', ('method', 'step', 'outcome')
+)
+PROVIDER_REQUEST_SECONDS = registry.histogram(
+    'shopbot_provider_request_seconds', 'HTTP request time per payment provider attempt', ('provider', 'status')
+)
+LOOP_LAG_SECONDS = registry.histogram(
+    'shopbot_event_loop_lag_seconds', 'How late the event loop ran a timer scheduled by the loop monitor'
+)
+LOOP_STALLS = registry.counter(
+    'shopbot_event_loop_stalls_total', 'Loop monitor samples at or above the lag threshold'
+)
+
+def timed_methods(histogram, exclude=()):
+    """Class decorator observing every public coroutine method in ``histogram`` by method name"""
+    def decorate(cls):
+        for name, function in list(vars(cls).items()):
+            if name.startswith('_') or name in exclude or not inspect.iscoroutinefunction(function):
+                continue
+            setattr(cls, name, _timed(histogram, name, function))
+        return cls
+    return decorate
+
+def _timed(histogram, name, function):
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await function(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - started, method=name)
+    return wrapper
@@ -0,0 +1,163 @@
+import asyncio
+import aiohttp
+import discord
+from collections import OrderedDict
+from bot.config import Config
+from bot.payments.registry import ProviderLimiter
+from bot.utils.embeds import EmbedBuilder
+from bot.utils.logger import setup_logger
+
+logger = setup_logger()
+
+class NotificationDispatcher:
+    """Delivers customer DMs from a bounded queue in the background.
+    
+    Callers enqueue and return at once. A few workers drain the queue through
+    one shared token bucket so a bulk action is paced at ``rate`` messages per
+    second rather than running into Discord's global limit; discord.py still
+    handles per-route 429s underneath. Users are resolved from the client cache,
+    then a local LRU, then ``fetch_user``, since the bot has no members intent.
+    """
+    
+    # Attempts per notification for 5xx, 429 and network errors
+    MAX_ATTEMPTS = 4
+    # Users kept after a fetch_user
+    USER_CACHE_SIZE = 5000
+    
+    def __init__(self, bot, workers=None, max_queue=None, rate=None):
+        self.bot = bot
+        self.workers = workers or Config.NOTIFY_WORKERS
+        self.queue = asyncio.Queue(maxsize=max_queue or Config.NOTIFY_QUEUE_SIZE)
+        self.limiter = ProviderLimiter(self.workers, rate or Config.NOTIFY_RATE)
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self._users = OrderedDict()
+        self._tasks = []
+    
+    def notify(self, user_id, embed):
+        """Queue a DM to a user; returns False if the queue is full"""
+        return self._enqueue(('user', user_id, embed, None))
+    
+    async def notify_wait(self, user_id, embed, done=None):
+        """Queue a DM to a user, waiting for room instead of dropping it.
+        
+        ``done`` is awaited as ``done(delivered)`` after the send is attempted;
+        it is not called for jobs still queued when the dispatcher stops.
+        """
+        await self.queue.put(('user', user_id, embed, done))
+    
+    def notify_order(self, order_id, title=None):
+        """Queue the order's current status to its buyer; loaded when the DM is sent"""
+        return self._enqueue(('order', order_id, title, None))
+    
+    def _enqueue(self, job):
+        try:
+            self.queue.put_nowait(job)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Notification queue full, dropped {job[0]} notification for {job[1]}")
+            return False
+    
+    async def resolve_user(self, user_id):
+        """User object for a DM, fetching it from the API if it is not cached"""
+        user = self.bot.get_user(user_id)
+        if user:
+            return user
+        
+        if user_id in self._users:
+            self._users.move_to_end(user_id)
+            return self._users[user_id]
+        
+        user = await self.bot.fetch_user(user_id)
+        self._users[user_id] = user
+        if len(self._users) > self.USER_CACHE_SIZE:
+            self._users.popitem(last=False)
+        return user
+    
+    async def build(self, job):
+        """(user_id, embed) for a queued job, or None if there is nothing to send"""
+        kind, target, extra, _ = job
+        if kind == 'user':
+            return target, extra
+        
+        order = await self.bot.db.get_order(target)
+        if not order:
+            return None
+        embed = EmbedBuilder.order_confirmation(order)
+        embed.title = extra or f"📋 Order {order['id']} Updated"
+        return order['user_id'], embed
+    
+    async def deliver(self, job):
+        """Send one notification, retrying transient failures with backoff"""
+        message = await self.build(job)
+        if not message:
+            return False
+        user_id, embed = message
+        
+        for attempt in range(1, self.MAX_ATTEMPTS + 1):
+            await self.limiter.acquire()
+            try:
+                user = await self.resolve_user(user_id)
+                await user.send(embed=embed)
+                self.sent += 1
+                return True
+            except (discord.Forbidden, discord.NotFound):
+                # DMs closed or the account is gone; retrying will not help
+                logger.info(f"Could not DM user {user_id}")
+                self.failed += 1
+                return False
+            except (discord.HTTPException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = getattr(e, 'status', None)
+                if status is not None and status < 500 and status != 429:
+                    logger.warning(f"Notification to user {user_id} rejected: {e}")
+                    break
+                logger.warning(f"Notification to user {user_id} failed (attempt {attempt}): {e}")
+            finally:
+                self.limiter.release()
+            
+            if attempt < self.MAX_ATTEMPTS:
+                await asyncio.sleep(2 ** attempt)
+        
+        self.failed += 1
+        return False
+    
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                delivered = False
+                try:
+                    delivered = await self.deliver(job)
+                except Exception as e:
+                    self.failed += 1
+                    logger.error(f"Notification error: {e}")
+                
+                done = job[3]
+                if done:
+                    await done(delivered)
+            except Exception as e:
+                logger.error(f"Notification callback error: {e}")
+            finally:
+                self.queue.task_done()
+    
+    def start(self):
+        """Start the worker tasks"""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+    
+    async def stop(self, timeout=5):
+        """Give queued notifications a moment to go out, then stop the workers"""
+        if not self._tasks:
+            return
+        
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopping with {self.queue.qsize()} notification(s) unsent")
+        
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
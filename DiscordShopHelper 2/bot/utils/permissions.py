@@ -1,4 +1,5 @@
 import discord
+import math
 from discord.ext import commands
 from bot.config import Config
 
@@ -40,3 +41,37 @@ def is_owner():
         return False
     
     return discord.app_commands.check(predicate)
+
+async def enforce_rate_limit(interaction: discord.Interaction, bucket):
+    """Count a request against the user's limit; replies and returns False when over it"""
+    retry_after = interaction.client.rate_limiter.hit(bucket, interaction.user.id)
+    if retry_after is None:
+        return True
+    
+    await interaction.response.send_message(
+        f"⏳ You're doing that too often. Try again in {math.ceil(retry_after)}s.",
+        ephemeral=True
+    )
+    return False
+
+def rate_limited(bucket=None):
+    """Limit how often a user can run a command (checked before anything else runs)"""
+    async def predicate(interaction: discord.Interaction):
+        return await enforce_rate_limit(interaction, bucket or interaction.command.name)
+    
+    return discord.app_commands.check(predicate)
+
+def pending_order_limit():
+    """Refuse new purchases from users already holding too many unpaid orders"""
+    async def predicate(interaction: discord.Interaction):
+        pending = await interaction.client.db.count_pending_orders(interaction.user.id)
+        if pending < Config.MAX_PENDING_ORDERS:
+            return True
+        
+        await interaction.response.send_message(
+            f"❌ You have {pending} unpaid orders. Pay or cancel one before starting another.",
+            ephemeral=True
+        )
+        return False
+    
+    return discord.app_commands.check(predicate)
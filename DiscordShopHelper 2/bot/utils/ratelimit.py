@@ -0,0 +1,49 @@
+import time
+from collections import deque
+from bot.config import Config
+
+class SlidingWindowLimiter:
+    """Per-user, per-bucket sliding-window counters kept in memory.
+    
+    Each (bucket, user) keeps at most ``limit`` timestamps, and keys idle
+    for longer than their window are swept every ``evict_interval`` seconds,
+    so memory stays proportional to recently active users.
+    """
+    
+    def __init__(self, limits=None, evict_interval=60):
+        self.limits = limits or Config.RATE_LIMITS
+        self.evict_interval = evict_interval
+        self.rejected = 0
+        self._hits = {}  # (bucket, user_id) -> deque of monotonic timestamps
+        self._last_evict = time.monotonic()
+    
+    def _limit(self, bucket):
+        return self.limits.get(bucket, self.limits['default'])
+    
+    def hit(self, bucket, user_id, now=None):
+        """Count a request; returns None if allowed, else seconds until it would be"""
+        now = now or time.monotonic()
+        if now - self._last_evict >= self.evict_interval:
+            self.evict(now)
+        
+        limit, window = self._limit(bucket)
+        hits = self._hits.setdefault((bucket, user_id), deque())
+        while hits and hits[0] <= now - window:
+            hits.popleft()
+        
+        if len(hits) >= limit:
+            self.rejected += 1
+            return hits[0] + window - now
+        
+        hits.append(now)
+        return None
+    
+    def evict(self, now=None):
+        """Drop counters whose most recent hit has left the window"""
+        now = now or time.monotonic()
+        for key in [key for key, hits in self._hits.items() if not hits or hits[-1] <= now - self._limit(key[0])[1]]:
+            del self._hits[key]
+        self._last_evict = now
+    
+    def __len__(self):
+        return len(self._hits)
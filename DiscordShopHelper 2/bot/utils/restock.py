@@ -0,0 +1,83 @@
+import asyncio
+from bot.utils.embeds import EmbedBuilder
+from bot.utils.logger import setup_logger
+
+logger = setup_logger()
+
+class RestockNotifier:
+    """Tells back-in-stock subscribers when a product returns.
+    
+    Runs as a background task started by the stock write, so the admin's
+    command returns at once. Only as many subscribers as there are units are
+    told, oldest subscription first; the rest stay subscribed for the next
+    restock. Subscriptions are claimed in batches and handed to the
+    notification dispatcher, which paces the DMs and blocks claiming while its
+    queue is full. A subscription is deleted only once its DM is sent. One
+    whose DM failed, or was still queued at shutdown, stays claimed until the
+    next start, when it is released and notified again if still in stock.
+    """
+    
+    BATCH_SIZE = 100
+    
+    def __init__(self, bot):
+        self.bot = bot
+        self.notified = 0
+        self._tasks = set()
+        self._claimed = set()  # subscription IDs whose DM is queued
+        self._drained = asyncio.Event()
+        self._drained.set()
+    
+    def record(self, product_id, name, stock):
+        """Start notifying subscribers of a product that just came back"""
+        task = asyncio.create_task(self.notify(product_id, name, stock))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def resume(self):
+        """Release claims left by a previous run and notify again for products in stock"""
+        for product_id, name, stock in await self.bot.db.release_stock_claims():
+            self.record(product_id, name, stock)
+    
+    async def notify(self, product_id, name, stock):
+        """Queue DMs for up to ``stock`` subscribers; returns how many were queued"""
+        embed = EmbedBuilder.back_in_stock(product_id, name, stock)
+        queued = 0
+        try:
+            while queued < stock:
+                claimed = await self.bot.db.claim_stock_subscribers(product_id, min(self.BATCH_SIZE, stock - queued))
+                if not claimed:
+                    break
+                self._claimed.update(subscription_id for subscription_id, _ in claimed)
+                self._drained.clear()
+                for subscription_id, user_id in claimed:
+                    await self.bot.notifications.notify_wait(user_id, embed, self._done_callback(subscription_id))
+                queued += len(claimed)
+        except Exception as e:
+            logger.error(f"Error notifying restock subscribers for product {product_id}: {e}")
+        
+        if queued:
+            self.notified += queued
+            logger.info(f"Queued {queued} back-in-stock notification(s) for product {product_id}")
+        return queued
+    
+    def _done_callback(self, subscription_id):
+        async def done(delivered):
+            try:
+                if delivered:
+                    await self.bot.db.delete_stock_subscription(subscription_id)
+            finally:
+                self._claimed.discard(subscription_id)
+                if not self._claimed:
+                    self._drained.set()
+        return done
+    
+    async def stop(self, timeout=5):
+        """Stop claiming and give queued DMs a moment to go out"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        
+        try:
+            await asyncio.wait_for(self._drained.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopping with {len(self._claimed)} back-in-stock notification(s) unsent; kept for the next start")
@@ -0,0 +1,101 @@
+import math
+import time
+from collections import deque
+
+class ShardStats:
+    """Connection history and recent event timestamps for one shard"""
+    
+    # Timestamps kept for the event rate; bounds memory under bursts
+    MAX_EVENTS = 10000
+    
+    def __init__(self, shard_id):
+        self.shard_id = shard_id
+        self.connects = 0
+        self.resumes = 0
+        self.disconnects = 0
+        self.events = 0
+        self.connected = False
+        self.last_change = None
+        self._recent = deque(maxlen=self.MAX_EVENTS)
+    
+    @property
+    def reconnects(self):
+        """Times the shard came back after its first connection"""
+        return max(self.connects - 1, 0) + self.resumes
+    
+    def events_per_minute(self, now=None):
+        now = now or time.monotonic()
+        while self._recent and self._recent[0] <= now - 60:
+            self._recent.popleft()
+        return len(self._recent)
+
+class ShardMonitor:
+    """Per-shard latency, reconnect and event-rate counters.
+    
+    Without sharding the single gateway connection is reported as shard 0.
+    """
+    
+    def __init__(self, bot, lag_threshold=None):
+        self.bot = bot
+        self.lag_threshold = lag_threshold or 1.0  # seconds of heartbeat latency
+        self.shards = {}
+    
+    def _shard(self, shard_id):
+        shard_id = shard_id or 0
+        if shard_id not in self.shards:
+            self.shards[shard_id] = ShardStats(shard_id)
+        return self.shards[shard_id]
+    
+    def connected(self, shard_id):
+        shard = self._shard(shard_id)
+        shard.connects += 1
+        shard.connected = True
+        shard.last_change = time.time()
+    
+    def resumed(self, shard_id):
+        shard = self._shard(shard_id)
+        shard.resumes += 1
+        shard.connected = True
+        shard.last_change = time.time()
+    
+    def disconnected(self, shard_id):
+        shard = self._shard(shard_id)
+        shard.disconnects += 1
+        shard.connected = False
+        shard.last_change = time.time()
+    
+    def record_event(self, shard_id):
+        """Count one unit of work (an interaction) handled on a shard"""
+        shard = self._shard(shard_id)
+        shard.events += 1
+        shard._recent.append(time.monotonic())
+    
+    def latencies(self):
+        """{shard_id: heartbeat latency in seconds, or None before the first heartbeat}"""
+        pairs = getattr(self.bot, 'latencies', None) or [(self.bot.shard_id or 0, self.bot.latency)]
+        return {shard_id: None if math.isinf(latency) or math.isnan(latency) else latency for shard_id, latency in pairs}
+    
+    def snapshot(self):
+        """One dict per shard, lagging shards flagged"""
+        latencies = self.latencies()
+        guild_counts = {}
+        for guild in self.bot.guilds:
+            guild_counts[guild.shard_id] = guild_counts.get(guild.shard_id, 0) + 1
+        
+        now = time.monotonic()
+        rows = []
+        for shard_id in sorted(set(latencies) | set(self.shards)):
+            shard = self._shard(shard_id)
+            latency = latencies.get(shard_id)
+            rows.append({
+                'shard_id': shard_id,
+                'latency_ms': None if latency is None else round(latency * 1000, 1),
+                'connected': shard.connected,
+                'guilds': guild_counts.get(shard_id, 0),
+                'reconnects': shard.reconnects,
+                'disconnects': shard.disconnects,
+                'events': shard.events,
+                'events_per_minute': shard.events_per_minute(now),
+                'lagging': not shard.connected or latency is None or latency > self.lag_threshold
+            })
+        return rows
@@ -0,0 +1,74 @@
+import asyncio
+import discord
+from bot.config import Config
+from bot.utils.logger import setup_logger
+
+logger = setup_logger()
+
+class LowStockAlerter:
+    """Posts low-stock alerts to the admin channel.
+    
+    The database calls ``record`` from the stock write that takes a product
+    below its threshold. Crossings within ``delay`` seconds of each other are
+    coalesced into one message, so a run of sales produces a single alert.
+    """
+    
+    def __init__(self, bot, channel_id=None, delay=None):
+        self.bot = bot
+        self.channel_id = channel_id or Config.ADMIN_CHANNEL_ID
+        self.delay = delay or Config.LOW_STOCK_ALERT_DELAY
+        self.sent = 0
+        self._pending = {}  # product_id -> (name, stock, threshold)
+        self._task = None
+    
+    def record(self, product_id, name, stock, threshold):
+        """Queue a product that just went below its threshold"""
+        self._pending[product_id] = (name, stock, threshold)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_later())
+    
+    def build_embed(self, products):
+        embed = discord.Embed(
+            title="⚠️ Low Stock",
+            description=f"{len(products)} product(s) just dropped below their stock threshold.",
+            color=Config.WARNING_COLOR
+        )
+        for product_id, (name, stock, threshold) in list(products.items())[:25]:
+            embed.add_field(
+                name=f"{name} (ID: {product_id})",
+                value=f"**Stock:** {stock}\n**Threshold:** {threshold}",
+                inline=True
+            )
+        return embed
+    
+    async def flush(self):
+        """Post everything recorded so far as one message"""
+        products, self._pending = self._pending, {}
+        if not products:
+            return
+        
+        if not self.channel_id:
+            logger.warning(f"Low stock: {', '.join(name for name, _, _ in products.values())} (ADMIN_CHANNEL_ID not set)")
+            return
+        
+        try:
+            channel = self.bot.get_channel(self.channel_id) or await self.bot.fetch_channel(self.channel_id)
+            await channel.send(embed=self.build_embed(products))
+            self.sent += 1
+        except Exception as e:
+            logger.error(f"Error sending low stock alert: {e}")
+    
+    async def _flush_later(self):
+        await asyncio.sleep(self.delay)
+        await self.flush()
+    
+    async def stop(self):
+        """Send any alert still waiting out its delay"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            await self.flush()
+        self._task = None
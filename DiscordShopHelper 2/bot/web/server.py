@@ -0,0 +1,163 @@
+import json
+from aiohttp import web
+from bot.config import Config
+from bot.payments.paypal import PayPalHandler
+from bot.utils.logger import setup_logger
+from bot.utils.metrics import registry
+
+logger = setup_logger()
+
+class WebServer:
+    """Embedded HTTP server for the health check and PayPal webhooks.
+    
+    Prometheus metrics are served by a second site on METRICS_HOST and
+    METRICS_PORT (localhost by default), never on the public port.
+    """
+    
+    # PayPal events that mean the buyer's money has been captured
+    PAYPAL_COMPLETED_EVENTS = ('PAYMENT.SALE.COMPLETED', 'PAYMENT.CAPTURE.COMPLETED')
+    
+    def __init__(self, bot, host=None, port=None):
+        self.bot = bot
+        self.host = host or Config.WEB_HOST
+        self.port = port or Config.WEB_PORT
+        self.paypal = PayPalHandler()
+        self._runner = None
+        self._metrics_runner = None
+        
+        self.app = web.Application()
+        self.app.router.add_get('/health', self.health)
+        self.app.router.add_post('/paypal/webhook', self.paypal_webhook)
+        self.app.router.add_get('/paypal/return', self.paypal_return)
+        self.app.router.add_get('/paypal/cancel', self.paypal_cancel)
+        
+        self.metrics_app = web.Application()
+        self.metrics_app.router.add_get('/metrics', self.metrics)
+    
+    async def start(self):
+        """Start listening"""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        logger.info(f"Web server listening on {self.host}:{self.port}")
+        
+        if Config.METRICS_PORT:
+            self._metrics_runner = web.AppRunner(self.metrics_app, access_log=None)
+            await self._metrics_runner.setup()
+            site = web.TCPSite(self._metrics_runner, Config.METRICS_HOST, Config.METRICS_PORT)
+            await site.start()
+            logger.info(f"Metrics listening on {Config.METRICS_HOST}:{Config.METRICS_PORT}")
+    
+    async def stop(self):
+        """Stop listening"""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        if self._metrics_runner:
+            await self._metrics_runner.cleanup()
+            self._metrics_runner = None
+    
+    async def health(self, request):
+        return web.json_response({
+            'status': 'ok',
+            'ready': self.bot.is_ready(),
+            'shards': self.bot.shard_monitor.snapshot(),
+            'event_loop': self.bot.loop_monitor.snapshot()
+        })
+    
+    async def metrics(self, request):
+        """Prometheus scrape endpoint"""
+        return web.Response(text=registry.render(), content_type='text/plain', charset='utf-8')
+    
+    async def paypal_webhook(self, request):
+        """Receive a PayPal webhook, verify it and settle the order it refers to"""
+        try:
+            event = json.loads(await request.text())
+        except ValueError:
+            return web.Response(status=400, text='invalid json')
+        
+        event_id = event.get('id')
+        if not event_id:
+            return web.Response(status=400, text='missing event id')
+        
+        if not await self.paypal.verify_webhook_signature(request.headers, event):
+            logger.warning(f"Rejected PayPal webhook {event_id}: bad signature")
+            return web.Response(status=400, text='invalid signature')
+        
+        try:
+            await self.handle_paypal_event(event)
+        except Exception as e:
+            logger.error(f"Error handling PayPal webhook {event_id}: {e}")
+            return web.Response(status=500, text='error')  # PayPal retries
+        
+        return web.Response(text='ok')
+    
+    async def handle_paypal_event(self, event):
+        """Transition the order named in the event's custom field"""
+        event_type = event.get('event_type')
+        if event_type not in self.PAYPAL_COMPLETED_EVENTS:
+            logger.info(f"Ignoring PayPal webhook {event.get('id')} ({event_type})")
+            return
+        
+        resource = event.get('resource') or {}
+        order_id = resource.get('custom') or resource.get('custom_id')
+        if not order_id and resource.get('parent_payment'):
+            order_id = await self.bot.db.get_payment_order_id(resource['parent_payment'])
+        if not order_id:
+            logger.warning(f"PayPal webhook {event.get('id')} has no order reference")
+            return
+        
+        order = await self.bot.db.get_order(order_id)
+        if not order or order['payment_method'] != 'paypal':
+            logger.warning(f"PayPal webhook {event.get('id')} refers to unknown order {order_id}")
+            return
+        
+        amount = resource.get('amount') or {}
+        paid = amount.get('total') or amount.get('value')
+        if paid is None or abs(float(paid) - order['total']) >= 0.01:
+            logger.warning(f"PayPal webhook {event.get('id')} amount {paid} does not match order {order_id}")
+            return
+        
+        # The unique idempotency key turns redeliveries into no-op inserts
+        recorded = await self.bot.db.record_payment_event(
+            order_id, 'paypal', f"paypal-webhook:{event['id']}", float(paid),
+            status='completed', payment_id=resource.get('parent_payment') or resource.get('id'),
+            transaction_hash=resource.get('id'), webhook_data=event
+        )
+        if not recorded:
+            logger.info(f"Duplicate PayPal webhook {event['id']}")
+        
+        # Conditional update, so also safe to repeat if a previous delivery failed halfway
+        if await self.bot.db.mark_order_paid(order_id, resource.get('id')):
+            logger.info(f"PayPal payment {resource.get('id')} completed order {order_id}")
+            return
+        
+        order = await self.bot.db.get_order(order_id)
+        if order['payment_id'] == resource.get('id'):
+            return  # this payment already completed the order
+        
+        # Money was captured but the order expired, was cancelled or was paid another way
+        review_id = await self.bot.db.add_payment_review(
+            'paypal', str(paid), resource.get('id'), 'order_not_payable', [order_id]
+        )
+        if review_id:
+            logger.warning(
+                f"PayPal payment {resource.get('id')} arrived for order {order_id} ({order['status']}); "
+                f"queued for review #{review_id}"
+            )
+    
+    async def paypal_return(self, request):
+        """Buyer approved the payment on PayPal; execute it"""
+        payment_id = request.query.get('paymentId')
+        payer_id = request.query.get('PayerID')
+        if not payment_id or not payer_id:
+            return web.Response(status=400, text='Missing payment details.')
+        
+        if await self.paypal.execute_payment(payment_id, payer_id):
+            return web.Response(text='Payment received! You can return to Discord.')
+        return web.Response(status=502, text='We could not complete your payment. Please try again from Discord.')
+    
+    async def paypal_cancel(self, request):
+        return web.Response(text='Payment cancelled. You can return to Discord.')
+
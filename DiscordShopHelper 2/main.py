@@ -1,34 +1,145 @@
 import discord
+from discord import app_commands
 from discord.ext import commands
 import asyncio
+import hashlib
+import json
 import os
+import time
 from bot.config import Config
 from bot.database.manager import DatabaseManager
-from bot.utils.logger import setup_logger
+from bot.payments import resilience
+from bot.payments.confirmations import ConfirmationTracker
+from bot.payments.expiry import OrderExpiryScheduler
+from bot.payments.matching import PaymentMatcher
+from bot.payments.registry import PaymentRegistry
+from bot.utils.dashboard import DashboardSnapshot
+from bot.utils.idempotency import InteractionDeduplicator
+from bot.utils.logger import bind_interaction, setup_logger
+from bot.utils.loop_monitor import LoopMonitor
+from bot.utils import metrics
+from bot.utils.notifications import NotificationDispatcher
+from bot.utils.ratelimit import SlidingWindowLimiter
+from bot.utils.restock import RestockNotifier
+from bot.utils.shards import ShardMonitor
+from bot.utils.stock_alerts import LowStockAlerter
+from bot.web.server import WebServer
 
 # Setup logging
 logger = setup_logger()
 
-class ShopBot(commands.Bot):
+class ShopCommandTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction):
+        # Runs in the command's task, so its log records carry the interaction ids
+        bind_interaction(interaction)
+        interaction.extras['started'] = time.perf_counter()
+        return True
+    
+    async def on_error(self, interaction, error):
+        status = 'rejected' if isinstance(error, app_commands.CheckFailure) else 'error'
+        observe_command(interaction, status)
+        if status == 'error':
+            await super().on_error(interaction, error)
+
+def observe_command(interaction, status):
+    """Record a slash command's handling time"""
+    started = interaction.extras.get('started')
+    if started is not None and interaction.command:
+        metrics.COMMAND_SECONDS.observe(
+            time.perf_counter() - started, command=interaction.command.qualified_name, status=status
+        )
+
+class ShopBot(commands.AutoShardedBot if Config.SHARDED else commands.Bot):
     def __init__(self):
         intents = discord.Intents.default()
         # Only enable what we need for slash commands
         intents.guilds = True
         
+        shard_options = {}
+        if Config.SHARDED:
+            # Without a count, Discord's recommended shard count is used and this process runs them all;
+            # discord.py only accepts shard_ids together with shard_count
+            shard_options = {'shard_count': Config.SHARD_COUNT}
+            if Config.SHARD_COUNT:
+                shard_options['shard_ids'] = Config.SHARD_IDS
+            elif Config.SHARD_IDS:
+                logger.warning("SHARD_IDS is ignored without SHARD_COUNT; running every recommended shard")
+        
         super().__init__(
             command_prefix='!',
             intents=intents,
-            help_command=None
+            help_command=None,
+            tree_cls=ShopCommandTree,
+            **shard_options
         )
         
         self.db = DatabaseManager()
+        self.payment_matcher = PaymentMatcher()
+        self.payments = PaymentRegistry(self)
+        self.interactions = InteractionDeduplicator()
+        self.rate_limiter = SlidingWindowLimiter()
+        self.confirmations = ConfirmationTracker(self.db, self.payment_matcher)
+        self.order_expiry = OrderExpiryScheduler(self.db, self.payment_matcher)
+        self.notifications = NotificationDispatcher(self)
+        self.dashboard = DashboardSnapshot(self.db)
+        self.stock_alerts = LowStockAlerter(self)
+        self.db.on_low_stock = self.stock_alerts.record
+        self.restock = RestockNotifier(self)
+        self.db.on_restock = self.restock.record
+        self.web = WebServer(self)
+        self.shard_monitor = ShardMonitor(self, Config.SHARD_LAG_SECONDS)
+        self.loop_monitor = LoopMonitor()
+        self.register_metrics()
         
+    def register_metrics(self):
+        """Gauges read from the bot's components when /metrics is scraped"""
+        metrics.registry.gauge(
+            'shopbot_notification_queue', 'Customer DMs waiting to be sent',
+            callback=lambda: self.notifications.queue.qsize()
+        )
+        metrics.registry.gauge(
+            'shopbot_pending_order_deadlines', 'Unpaid orders scheduled for expiry',
+            callback=lambda: self.order_expiry.pending_count
+        )
+        metrics.registry.gauge(
+            'shopbot_tracked_transactions', 'ETH transactions awaiting confirmations',
+            callback=lambda: self.confirmations.pending_count
+        )
+        metrics.registry.gauge(
+            'shopbot_shard_latency_seconds', 'Gateway heartbeat latency', ('shard',),
+            callback=lambda: {(shard_id,): latency for shard_id, latency in self.shard_monitor.latencies().items()}
+        )
+    
     async def setup_hook(self):
         """Called when the bot is starting up"""
         try:
+            # Watch for blocking code on the event loop from the start
+            if Config.LOOP_MONITOR:
+                self.loop_monitor.start(asyncio_debug=Config.LOOP_ASYNCIO_DEBUG)
+            
+            # Serve /health and payment webhooks
+            await self.web.start()
+            
             # Initialize database
             await self.db.initialize()
             
+            # Rebuild the open crypto quote index
+            await self.payment_matcher.load(self.db)
+            for tx_hash in await self.db.get_submitted_transactions('eth'):
+                self.confirmations.track(tx_hash)
+            self.confirmations.start()
+            
+            # Deliver customer DMs and keep the /admin figures current in the background
+            self.notifications.start()
+            self.dashboard.start()
+            
+            # Retry back-in-stock DMs that were not sent before the last shutdown
+            await self.restock.resume()
+            
+            # Cancel unpaid orders when their payment window closes
+            await self.order_expiry.load()
+            self.order_expiry.start()
+            
             # Add sample products if database is empty
             await self.add_sample_products()
             
@@ -37,14 +148,40 @@ class ShopBot(commands.Bot):
             await self.load_extension('bot.commands.admin')
             await self.load_extension('bot.commands.orders')
             
-            # Sync slash commands
-            synced = await self.tree.sync()
-            logger.info(f"Synced {len(synced)} command(s)")
+            # Sync slash commands, skipped when nothing changed since the last sync
+            await self.sync_commands()
             
         except Exception as e:
             logger.error(f"Setup error: {e}")
             raise
     
+    def command_tree_hash(self, guild=None):
+        """Stable hash of the commands as they would be sent to Discord"""
+        payload = sorted(
+            (command.to_dict(self.tree) for command in self.tree.get_commands(guild=guild)),
+            key=lambda command: (command.get('type', 1), command['name'])
+        )
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+    
+    async def sync_commands(self, force=False):
+        """Sync the command tree if it differs from the last synced one"""
+        guild = None
+        if Config.SYNC_COMMANDS_TO_GUILD and Config.GUILD_ID:
+            # Guild commands update instantly, which suits development servers
+            guild = discord.Object(id=Config.GUILD_ID)
+            self.tree.copy_global_to(guild=guild)
+        
+        setting_key = f"command_tree_hash:{guild.id}" if guild else 'command_tree_hash'
+        tree_hash = self.command_tree_hash(guild)
+        if not force and not Config.FORCE_COMMAND_SYNC and await self.db.get_setting(setting_key) == tree_hash:
+            logger.info("Command tree unchanged, skipping sync")
+            return None
+        
+        synced = await self.tree.sync(guild=guild)
+        await self.db.set_setting(setting_key, tree_hash)
+        logger.info(f"Synced {len(synced)} command(s)" + (f" to guild {guild.id}" if guild else ""))
+        return synced
+    
     async def add_sample_products(self):
         """Add sample products if database is empty"""
         try:
@@ -55,6 +192,19 @@ class ShopBot(commands.Bot):
         except Exception as e:
             logger.error(f"Error adding sample products: {e}")
     
+    async def close(self):
+        """Stop background tasks before disconnecting"""
+        await self.confirmations.stop()
+        await self.order_expiry.stop()
+        await self.restock.stop()
+        await self.notifications.stop()
+        await self.dashboard.stop()
+        await self.stock_alerts.stop()
+        await self.web.stop()
+        await self.loop_monitor.stop()
+        await resilience.close_session()
+        await super().close()
+    
     async def on_ready(self):
         logger.info(f'{self.user} has connected to Discord!')
         logger.info(f'Bot is in {len(self.guilds)} guilds')
@@ -67,6 +217,35 @@ class ShopBot(commands.Bot):
             )
         )
     
+    # Gateway health; sharded clients report each shard through the on_shard_* events
+    async def on_connect(self):
+        if not Config.SHARDED:
+            self.shard_monitor.connected(0)
+    
+    async def on_resumed(self):
+        if not Config.SHARDED:
+            self.shard_monitor.resumed(0)
+    
+    async def on_disconnect(self):
+        if not Config.SHARDED:
+            self.shard_monitor.disconnected(0)
+    
+    async def on_shard_connect(self, shard_id):
+        self.shard_monitor.connected(shard_id)
+    
+    async def on_shard_resumed(self, shard_id):
+        self.shard_monitor.resumed(shard_id)
+    
+    async def on_shard_disconnect(self, shard_id):
+        logger.warning(f"Shard {shard_id} disconnected")
+        self.shard_monitor.disconnected(shard_id)
+    
+    async def on_app_command_completion(self, interaction, command):
+        observe_command(interaction, 'ok')
+    
+    async def on_interaction(self, interaction):
+        self.shard_monitor.record_event(interaction.guild.shard_id if interaction.guild else 0)
+    
     async def on_command_error(self, ctx, error):
         """Global error handler"""
         if isinstance(error, commands.CommandNotFound):
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Scripted checkout benchmark against the offline provider simulator.
+
+Runs N buyers through the same checkout path PaymentMethodView uses
+(bot.payments.checkout), with a bounded number in flight at once, and
+reports latency percentiles and throughput. Uses a throwaway database.
+    
+    python -m tools.checkout_bench --buyers 500 --concurrency 50 --method mix
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from bot.config import Config
+from bot.database.manager import DatabaseManager
+from bot.payments import resilience
+from bot.payments.checkout import CheckoutError, create_payment_link, start_checkout
+from bot.payments.expiry import OrderExpiryScheduler
+from bot.payments.matching import PaymentMatcher
+from bot.payments.registry import PaymentRegistry
+from tools.provider_simulator import ProviderSimulator, add_profile_arguments, profiles_from_args
+
+METHODS = ('paypal', 'eth', 'ltc', 'cashapp')
+
+class BenchBot:
+    """The parts of ShopBot the checkout path needs"""
+    
+    def __init__(self):
+        self.db = DatabaseManager()
+        self.payment_matcher = PaymentMatcher()
+        self.order_expiry = OrderExpiryScheduler(self.db, self.payment_matcher)
+        self.payments = PaymentRegistry(self)
+
+def point_config_at(base_url, db_path):
+    Config.DATABASE_PATH = db_path
+    Config.PAYPAL_API_BASE = f"{base_url}/paypal"
+    Config.COINGECKO_API_BASE = f"{base_url}/coingecko"
+    Config.ETH_RPC_URL = f"{base_url}/eth"
+    Config.BLOCKCYPHER_API_BASE = f"{base_url}/blockcypher"
+    Config.PAYPAL_CLIENT_ID = Config.PAYPAL_CLIENT_ID or 'simulator'
+    Config.PAYPAL_CLIENT_SECRET = Config.PAYPAL_CLIENT_SECRET or 'simulator'
+    Config.ETH_WALLET_ADDRESS = Config.ETH_WALLET_ADDRESS or '0x000000000000000000000000000000000000dEaD'
+    Config.LTC_WALLET_ADDRESS = Config.LTC_WALLET_ADDRESS or 'LSimulatorWallet'
+    for info in Config.PAYMENT_METHODS.values():
+        info['enabled'] = True
+
+async def checkout(bot, user_id, product_id, method):
+    """One buyer clicking a payment button (and the PayPal link button)"""
+    deadline = time.monotonic() + resilience.INITIAL_RESPONSE_WINDOW
+    order = await start_checkout(bot, user_id, product_id, 1, method, deadline=deadline)
+    if method == 'paypal':
+        if not await create_payment_link(bot, order, deadline=time.monotonic() + Config.PROVIDER_TIMEOUT):
+            raise CheckoutError("PayPal link failed")
+    return order
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+async def run(args):
+    simulator = ProviderSimulator(profiles_from_args(args))
+    await simulator.start('127.0.0.1', args.port)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        point_config_at(f"http://127.0.0.1:{args.port}", os.path.join(tmp, 'bench.db'))
+        bot = BenchBot()
+        await bot.db.initialize()
+        product_id = await bot.db.create_product(
+            'Bench Item', 'Benchmark product', 9.99, 'robux', stock=args.buyers
+        )
+        
+        methods = METHODS if args.method == 'mix' else (args.method,)
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies = []
+        failures = {}
+        
+        async def buyer(user_id):
+            method = random.choice(methods)
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    await checkout(bot, user_id, product_id, method)
+                    latencies.append(time.perf_counter() - started)
+                except Exception as e:
+                    key = f"{method}: {e}"
+                    failures[key] = failures.get(key, 0) + 1
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(buyer(user_id) for user_id in range(1, args.buyers + 1)))
+        elapsed = time.perf_counter() - started
+    
+    await resilience.close_session()
+    await simulator.stop()
+    
+    print(f"Buyers: {args.buyers}  concurrency: {args.concurrency}  method: {args.method}")
+    print(f"Succeeded: {len(latencies)}  failed: {sum(failures.values())}")
+    for reason, count in sorted(failures.items(), key=lambda item: -item[1]):
+        print(f"  {count:5d}  {reason}")
+    if latencies:
+        print(
+            f"Latency ms  p50: {percentile(latencies, 50) * 1000:.1f}  "
+            f"p90: {percentile(latencies, 90) * 1000:.1f}  "
+            f"p99: {percentile(latencies, 99) * 1000:.1f}  "
+            f"max: {max(latencies) * 1000:.1f}  "
+            f"mean: {statistics.mean(latencies) * 1000:.1f}"
+        )
+    print(f"Throughput: {len(latencies) / elapsed:.1f} checkouts/s over {elapsed:.2f}s")
+    for provider, stats in simulator.stats.items():
+        if stats['requests']:
+            print(f"  {provider:12s} requests: {stats['requests']}  errors: {stats['errors']}  throttled: {stats['throttled']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--buyers', type=int, default=200, help='Number of simulated buyers')
+    parser.add_argument('--concurrency', type=int, default=20, help='Buyers checking out at once')
+    parser.add_argument('--method', choices=METHODS + ('mix',), default='mix')
+    parser.add_argument('--port', type=int, default=8765, help='Port for the in-process simulator')
+    add_profile_arguments(parser)
+    asyncio.run(run(parser.parse_args()))
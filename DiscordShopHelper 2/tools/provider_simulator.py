@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for the payment provider APIs the bot calls.
+
+Implements the subset of PayPal (v1 payments), CoinGecko, Ethereum JSON-RPC
+and BlockCypher used by bot/payments, with configurable latency, error rate
+and rate limits. Point the bot at it through Config:
+    
+    PAYPAL_API_BASE=http://127.0.0.1:8765/paypal
+    COINGECKO_API_BASE=http://127.0.0.1:8765/coingecko
+    ETH_RPC_URL=http://127.0.0.1:8765/eth
+    BLOCKCYPHER_API_BASE=http://127.0.0.1:8765/blockcypher
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from aiohttp import web
+
+PROVIDERS = ('paypal', 'coingecko', 'eth', 'blockcypher')
+
+class ProviderProfile:
+    """Latency, error and rate-limit behaviour of one simulated provider"""
+    
+    def __init__(self, latency_ms=50, jitter_ms=20, distribution='normal', error_rate=0.0, rate_limit=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.distribution = distribution
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit  # requests per second, 0 = unlimited
+        self._tokens = rate_limit
+        self._refilled = time.monotonic()
+    
+    def delay(self):
+        """Seconds to wait before answering"""
+        if self.distribution == 'fixed':
+            ms = self.latency_ms
+        elif self.distribution == 'uniform':
+            ms = random.uniform(self.latency_ms - self.jitter_ms, self.latency_ms + self.jitter_ms)
+        elif self.distribution == 'lognormal':
+            # Median latency_ms with a long tail controlled by jitter_ms
+            sigma = max(self.jitter_ms / max(self.latency_ms, 1), 0.01)
+            ms = random.lognormvariate(0, sigma) * self.latency_ms
+        else:
+            ms = random.gauss(self.latency_ms, self.jitter_ms)
+        return max(ms, 0) / 1000
+    
+    def admit(self):
+        """Token bucket check; False means answer 429"""
+        if not self.rate_limit:
+            return True
+        now = time.monotonic()
+        self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit)
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+class ProviderSimulator:
+    def __init__(self, profiles=None, eth_price=3000.0, ltc_price=80.0, block_time=12.0):
+        self.profiles = {name: ProviderProfile() for name in PROVIDERS}
+        self.profiles.update(profiles or {})
+        self.prices = {'ethereum': eth_price, 'litecoin': ltc_price}
+        self.block_time = block_time
+        self.started = time.time()
+        self.payments = {}
+        self.transactions = {}  # tx_hash -> {'to', 'value' (base units), 'block'}
+        self.stats = {name: {'requests': 0, 'errors': 0, 'throttled': 0} for name in PROVIDERS}
+        self._runner = None
+        
+        self.app = web.Application(middlewares=[self._behaviour])
+        self.app.router.add_post('/paypal/v1/oauth2/token', self.paypal_token)
+        self.app.router.add_post('/paypal/v1/payments/payment', self.paypal_create)
+        self.app.router.add_post('/paypal/v1/payments/payment/{payment_id}/execute', self.paypal_execute)
+        self.app.router.add_get('/paypal/v1/payments/payment/{payment_id}', self.paypal_get)
+        self.app.router.add_post('/paypal/v1/notifications/verify-webhook-signature', self.paypal_verify_webhook)
+        self.app.router.add_get('/coingecko/simple/price', self.coingecko_price)
+        self.app.router.add_post('/eth', self.eth_rpc)
+        self.app.router.add_get('/blockcypher/txs/{tx_hash}', self.blockcypher_tx)
+        self.app.router.add_get('/_stats', self.get_stats)
+    
+    @property
+    def block_number(self):
+        return 1_000_000 + int((time.time() - self.started) / self.block_time)
+    
+    def add_transaction(self, tx_hash, to, value, block=None):
+        """Register a transfer the chain endpoints will report"""
+        self.transactions[tx_hash.lower()] = {
+            'to': to,
+            'value': value,
+            'block': self.block_number if block is None else block
+        }
+    
+    @web.middleware
+    async def _behaviour(self, request, handler):
+        provider = request.path.strip('/').split('/')[0]
+        profile = self.profiles.get(provider)
+        if not profile:
+            return await handler(request)
+        
+        stats = self.stats[provider]
+        stats['requests'] += 1
+        if not profile.admit():
+            stats['throttled'] += 1
+            return web.json_response({'error': 'rate limited'}, status=429)
+        
+        await asyncio.sleep(profile.delay())
+        if random.random() < profile.error_rate:
+            stats['errors'] += 1
+            return web.json_response({'error': 'simulated failure'}, status=503)
+        
+        return await handler(request)
+    
+    async def start(self, host='127.0.0.1', port=8765):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+    
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+    
+    # PayPal
+    async def paypal_token(self, request):
+        return web.json_response({'access_token': f"SIM-{uuid.uuid4().hex}", 'expires_in': 32400})
+    
+    async def paypal_create(self, request):
+        body = await request.json()
+        payment_id = f"PAYID-{uuid.uuid4().hex[:20].upper()}"
+        self.payments[payment_id] = {'id': payment_id, 'state': 'created', 'transactions': body.get('transactions', [])}
+        return web.json_response({
+            'id': payment_id,
+            'state': 'created',
+            'links': [
+                {'rel': 'approval_url', 'href': f"https://www.sandbox.paypal.com/checkoutnow?token={payment_id}"}
+            ]
+        }, status=201)
+    
+    async def paypal_execute(self, request):
+        payment = self.payments.get(request.match_info['payment_id'])
+        if not payment:
+            return web.json_response({'name': 'INVALID_RESOURCE_ID'}, status=404)
+        payment['state'] = 'approved'
+        return web.json_response(payment)
+    
+    async def paypal_get(self, request):
+        payment = self.payments.get(request.match_info['payment_id'])
+        if not payment:
+            return web.json_response({'name': 'INVALID_RESOURCE_ID'}, status=404)
+        return web.json_response(payment)
+    
+    async def paypal_verify_webhook(self, request):
+        return web.json_response({'verification_status': 'SUCCESS'})
+    
+    # CoinGecko
+    async def coingecko_price(self, request):
+        ids = request.query.get('ids', '').split(',')
+        return web.json_response({
+            coin: {'usd': self.prices[coin]} for coin in ids if coin in self.prices
+        })
+    
+    # Ethereum JSON-RPC
+    async def eth_rpc(self, request):
+        payload = await request.json()
+        calls = payload if isinstance(payload, list) else [payload]
+        head = self.block_number
+        
+        responses = []
+        for call in calls:
+            if call.get('method') == 'eth_blockNumber':
+                result = hex(head)
+            elif call.get('method') == 'eth_getTransactionByHash':
+                tx = self.transactions.get(call['params'][0].lower())
+                result = None
+                if tx:
+                    result = {
+                        'hash': call['params'][0],
+                        'to': tx['to'],
+                        'value': hex(tx['value']),
+                        'blockNumber': hex(tx['block']) if tx['block'] <= head else None
+                    }
+            else:
+                responses.append({'jsonrpc': '2.0', 'id': call.get('id'),
+                                  'error': {'code': -32601, 'message': 'Method not found'}})
+                continue
+            responses.append({'jsonrpc': '2.0', 'id': call.get('id'), 'result': result})
+        
+        return web.json_response(responses if isinstance(payload, list) else responses[0])
+    
+    # BlockCypher
+    async def blockcypher_tx(self, request):
+        tx = self.transactions.get(request.match_info['tx_hash'].lower())
+        if not tx:
+            return web.json_response({'error': 'Transaction not found'}, status=404)
+        return web.json_response({
+            'hash': request.match_info['tx_hash'],
+            'confirmations': max(0, self.block_number - tx['block'] + 1),
+            'outputs': [{'addresses': [tx['to']], 'value': tx['value']}]
+        })
+    
+    async def get_stats(self, request):
+        return web.json_response(self.stats)
+
+def add_profile_arguments(parser):
+    parser.add_argument('--latency-ms', type=float, default=50, help='Median provider latency')
+    parser.add_argument('--jitter-ms', type=float, default=20, help='Latency spread')
+    parser.add_argument('--distribution', choices=['fixed', 'normal', 'uniform', 'lognormal'], default='normal')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered 503')
+    parser.add_argument('--rate-limit', type=float, default=0, help='Requests per second per provider (0 = unlimited)')
+    parser.add_argument('--provider-config', default='{}',
+                        help='JSON overrides per provider, e.g. \'{"paypal": {"latency_ms": 400}}\'')
+
+def profiles_from_args(args):
+    defaults = {
+        'latency_ms': args.latency_ms,
+        'jitter_ms': args.jitter_ms,
+        'distribution': args.distribution,
+        'error_rate': args.error_rate,
+        'rate_limit': args.rate_limit
+    }
+    overrides = json.loads(args.provider_config)
+    return {
+        name: ProviderProfile(**{**defaults, **overrides.get(name, {})})
+        for name in PROVIDERS
+    }
+
+async def serve(args):
+    simulator = ProviderSimulator(profiles_from_args(args))
+    await simulator.start(args.host, args.port)
+    print(f"Provider simulator listening on http://{args.host}:{args.port}")
+    await asyncio.Event().wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_profile_arguments(parser)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass